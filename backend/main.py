@@ -1,6 +1,7 @@
 import os
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -9,6 +10,8 @@ from routers import document
 from routers import addin
 from routers import projects
 from routers import research
+from services.academic_search import academic_search
+from services.validator import warmup_kernels
 
 load_dotenv()
 
@@ -50,12 +53,57 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
 )
 
+# Rotas que nunca passam pelo gzip: SSE (cada evento precisa chegar ao cliente
+# assim que é gerado) e conteúdo já comprimido (.docx é um ZIP, PDF do preview,
+# imagens em base64 do proxy)
+GZIP_EXCLUDED_PREFIXES = (
+    "/api/documents/download/",
+    "/api/documents/preview/",
+    "/api/addin/image-proxy",
+)
+GZIP_EXCLUDED_SUFFIXES = ("-stream",)
+
+
+class SelectiveGZipMiddleware:
+    """
+    GZipMiddleware aplicado apenas às rotas compressíveis.
+    A decisão é feita pelo caminho, antes de chamar a rota, sem depender de
+    qual versão do Starlette deixa text/event-stream sem compressão.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000):
+        self.app = app
+        self.gzip_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"].rstrip("/")
+            if not path.startswith(GZIP_EXCLUDED_PREFIXES) and not path.endswith(GZIP_EXCLUDED_SUFFIXES):
+                await self.gzip_app(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+# Compressão gzip das respostas grandes (texto gerado, HTML, validações)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1000)
+
 # Routers
 app.include_router(document.router, prefix="/api/documents", tags=["documents"])
 app.include_router(addin.router, prefix="/api", tags=["addin"])
 app.include_router(projects.router, tags=["projects"])
 app.include_router(research.router, prefix="/api/research", tags=["research"])
 
+@app.on_event("startup")
+def warmup():
+    """Aquece caminhos com custo de primeira chamada antes de atender requisições"""
+    # Compilação JIT (Numba) dos kernels do validador
+    warmup_kernels()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Fecha conexões HTTP mantidas abertas pelos serviços"""
+    await academic_search.aclose()
+
 @app.get("/")
 def read_root():
     return {"message": "Normaex Backend is running"}
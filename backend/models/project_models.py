@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
+import os
 import uuid
 
 
@@ -31,7 +32,8 @@ class PDFDocument(BaseModel):
     filename: str = Field(..., description="Nome original do arquivo")
     file_path: str = Field(..., description="Caminho do arquivo no servidor")
     status: PDFStatus = Field(default=PDFStatus.PENDING, description="Status do processamento")
-    extracted_text: Optional[str] = Field(None, description="Texto extraído do PDF")
+    extracted_text: Optional[str] = Field(None, description="Texto extraído do PDF (carregado sob demanda)")
+    extracted_text_path: Optional[str] = Field(None, description="Arquivo .txt com o texto extraído")
     page_count: int = Field(0, description="Número de páginas")
     word_count: int = Field(0, description="Contagem de palavras extraídas")
     upload_date: datetime = Field(default_factory=datetime.now, description="Data de upload")
@@ -42,6 +44,15 @@ class PDFDocument(BaseModel):
             datetime: lambda v: v.isoformat()
         }
 
+    def load_text(self) -> Optional[str]:
+        """Retorna o texto extraído, lendo o arquivo .txt se não estiver em memória"""
+        if self.extracted_text is not None:
+            return self.extracted_text
+        if self.extracted_text_path and os.path.exists(self.extracted_text_path):
+            with open(self.extracted_text_path, "r", encoding="utf-8") as f:
+                return f.read()
+        return None
+
 
 class PDFSummary(BaseModel):
     """Resumo de um PDF para listagem"""
@@ -78,11 +89,14 @@ class Project(BaseModel):
         total_chars = 0
 
         for pdf in self.pdfs:
-            if pdf.status == PDFStatus.READY and pdf.extracted_text:
-                remaining = max_chars - total_chars
-                if remaining <= 0:
-                    break
-                text = pdf.extracted_text[:remaining]
+            if pdf.status != PDFStatus.READY:
+                continue
+            remaining = max_chars - total_chars
+            if remaining <= 0:
+                break
+            extracted_text = pdf.load_text()
+            if extracted_text:
+                text = extracted_text[:remaining]
                 texts.append(f"[Fonte: {pdf.filename}]\n{text}")
                 total_chars += len(text)
 
@@ -39,7 +39,7 @@ from models.addin_models import (
     InlineReviewResponse
 )
 
-from services.inline_review import review_selection
+from services.inline_review import review_selection_async
 
 from services.ai import (
     chat_with_document,
@@ -74,7 +74,7 @@ async def analyze_content(request: Request, content: DocumentContent):
     """
     try:
         # Concatenar texto dos parágrafos se full_text não foi fornecido
-        full_text = content.full_text or "\n".join([p.text for p in content.paragraphs])
+        full_text = content.full_text or "\n".join(p.text for p in content.paragraphs)
 
         if not full_text.strip():
             return AnalysisResponse(
@@ -890,18 +890,26 @@ async def image_proxy(request: Request, url: str):
             )
 
         async with httpx.AsyncClient(timeout=15.0, follow_redirects=True, max_redirects=3) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-
-            # Validar content-type
-            content_type = response.headers.get('content-type', '')
-            if not content_type.startswith('image/'):
-                raise HTTPException(status_code=400, detail="URL não retornou uma imagem válida")
-
-            # Validar tamanho
-            image_data = response.content
-            if len(image_data) > MAX_IMAGE_SIZE:
-                raise HTTPException(status_code=413, detail="Imagem excede o limite de 10MB")
+            # Corpo lido em streaming: content-type e tamanho são checados
+            # antes (ou durante) o download, sem baixar imagens recusadas
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+
+                # Validar content-type
+                content_type = response.headers.get('content-type', '')
+                if not content_type.startswith('image/'):
+                    raise HTTPException(status_code=400, detail="URL não retornou uma imagem válida")
+
+                # Validar tamanho (declarado e efetivamente recebido)
+                declared_size = response.headers.get('content-length', '')
+                if declared_size.isdigit() and int(declared_size) > MAX_IMAGE_SIZE:
+                    raise HTTPException(status_code=413, detail="Imagem excede o limite de 10MB")
+
+                image_data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    image_data += chunk
+                    if len(image_data) > MAX_IMAGE_SIZE:
+                        raise HTTPException(status_code=413, detail="Imagem excede o limite de 10MB")
 
             base64_data = base64.b64encode(image_data).decode('utf-8')
 
@@ -997,7 +1005,7 @@ async def review_selection_endpoint(request: Request, review_request: InlineRevi
     """
     Revisa um trecho de texto selecionado (gramática, estilo, clareza).
     """
-    result = review_selection(
+    result = await review_selection_async(
         text=review_request.selected_text,
         instruction=review_request.instruction,
         format_type=review_request.format_type.value
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from fastapi.responses import FileResponse, HTMLResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import asyncio
+import copy
 import shutil
 import os
+import threading
+import time
+from collections import OrderedDict
 import json
 import mammoth
 from urllib.parse import unquote
@@ -85,9 +90,30 @@ class ImproveTextRequest(BaseModel):
     text: str  # Texto selecionado pelo usuário para melhorar
 
 
+class ValidateBatchItem(BaseModel):
+    filename: str
+    compare_with: Optional[str] = None
+
+
+class ValidateBatchRequest(BaseModel):
+    files: List[ValidateBatchItem]
+
+
 UPLOAD_DIR = "uploads"
 PROCESSED_DIR = "processed"
 
+# Limite de documentos por chamada de /validate-batch
+MAX_VALIDATE_BATCH = 20
+
+# Intervalo (s) para checar desconexão do cliente enquanto o streaming espera chunks
+STREAM_DISCONNECT_POLL = 1.0
+
+# Respostas de validação reaproveitadas enquanto os arquivos não mudam
+# (chave inclui mtime e tamanho); VALIDATE_CACHE_TTL=0 desativa o cache
+VALIDATE_CACHE_SIZE = 64
+VALIDATE_CACHE_TTL = int(os.getenv("VALIDATE_CACHE_TTL", "1800"))
+_validate_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
@@ -1112,27 +1138,68 @@ async def smart_format(request: ApplyRequest):
         raise HTTPException(status_code=500, detail="Erro interno ao aplicar formatação inteligente")
 
 
-@router.get("/validate/{filename}")
-async def validate_document(filename: str, compare_with: Optional[str] = None):
+# PDFs temporários de validação: conversão, leitura e remoção sob o mesmo lock,
+# para que validações simultâneas do mesmo documento não disputem o arquivo
+# (a conversão em si já é serializada dentro de convert_docx_to_pdf)
+_validation_pdf_lock = threading.Lock()
+
+# Validações (PyMuPDF) uma de cada vez: o MuPDF não suporta uso concorrente
+# entre threads e a extração segura o GIL, então threads paralelas não ganham
+# tempo; to_thread serve apenas para liberar o event loop
+_pdf_lock = threading.Lock()
+
+
+def _validate_docx(docx_path: str, pdf_suffix: str) -> Optional[dict]:
     """
-    NORMAEX 2.0 - FASE 4: Validação Visual de Formatação
+    Converte o DOCX para um PDF temporário, valida e remove o PDF.
+
+    Args:
+        docx_path: Caminho do arquivo DOCX
+        pdf_suffix: Sufixo que substitui ".docx" no nome do PDF temporário
+
+    Returns:
+        dict: Resultado de validate_document_quality, ou None se a conversão falhar
+    """
+    pdf_path = docx_path.replace(".docx", pdf_suffix)
+    with _validation_pdf_lock:
+        conversion_success = convert_docx_to_pdf(docx_path, pdf_path)
+        if not conversion_success or not os.path.exists(pdf_path):
+            return None
+
+        try:
+            with open(pdf_path, "rb") as f:
+                pdf_bytes = f.read()
+        finally:
+            try:
+                os.remove(pdf_path)
+            except:
+                pass
+
+    with _pdf_lock:
+        return validate_document_quality(pdf_bytes)
+
+
+def _file_key(path: Optional[str]) -> Optional[tuple]:
+    """Identifica a versão de um arquivo por (caminho, mtime, tamanho)"""
+    if not path:
+        return None
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
 
-    Este endpoint valida se o documento formatado está em conformidade
-    com as normas ABNT usando análise visual do PDF.
+
+async def _validate_file(filename: str, compare_with: Optional[str] = None) -> dict:
+    """
+    Valida um documento (e opcionalmente compara com o original).
 
     Args:
         filename: Nome do arquivo a ser validado
         compare_with: (Opcional) Nome do arquivo original para comparação
 
     Returns:
-        dict: Resultado completo da validação com scores 0-100
+        dict: Resposta do endpoint de validação
 
-    Validações realizadas:
-    - Margens (3cm top/left, 2cm bottom/right)
-    - Fontes (Arial/Times 12pt)
-    - Espaçamento (1.5 entre linhas)
-    - Alinhamento (justificado)
-    - Score geral de conformidade ABNT
+    Raises:
+        HTTPException: Se o documento não existir ou não puder ser convertido
     """
     # Procurar arquivo formatado
     file_path = None
@@ -1152,73 +1219,95 @@ async def validate_document(filename: str, compare_with: Optional[str] = None):
     if not file_path:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
 
-    try:
-        # 1. Converter documento para PDF
-        pdf_path = file_path.replace(".docx", "_validation.pdf")
-        conversion_success = convert_docx_to_pdf(file_path, pdf_path)
-
-        if not conversion_success or not os.path.exists(pdf_path):
-            raise HTTPException(
-                status_code=500,
-                detail="Não foi possível converter o documento para PDF para validação"
-            )
-
-        # 2. Validar documento formatado
-        validation_result = validate_document_quality(pdf_path)
-
-        # 3. Se houver arquivo original para comparação
-        comparison_result = None
-        if compare_with:
-            original_path = f"{UPLOAD_DIR}/{compare_with}"
-            if os.path.exists(original_path):
-                original_pdf_path = original_path.replace(".docx", "_validation_original.pdf")
-                original_conversion = convert_docx_to_pdf(original_path, original_pdf_path)
-
-                if original_conversion and os.path.exists(original_pdf_path):
-                    original_validation = validate_document_quality(original_pdf_path)
-
-                    # Calcular melhorias
-                    comparison_result = {
-                        "original_score": original_validation["overall_score"],
-                        "formatted_score": validation_result["overall_score"],
-                        "improvement": validation_result["overall_score"] - original_validation["overall_score"],
-                        "improvements_by_category": {
-                            "margins": validation_result["margins"]["score"] - original_validation["margins"]["score"],
-                            "fonts": validation_result["fonts"]["score"] - original_validation["fonts"]["score"],
-                            "spacing": validation_result["spacing"]["score"] - original_validation["spacing"]["score"],
-                            "alignment": validation_result["alignment"]["score"] - original_validation["alignment"]["score"]
-                        }
-                    }
-
-                    # Limpar PDF original temporário
-                    try:
-                        os.remove(original_pdf_path)
-                    except:
-                        pass
-
-        # 4. Limpar PDF temporário
-        try:
-            os.remove(pdf_path)
-        except:
-            pass
+    # 1-2. Converter para PDF e validar o documento formatado e, se houver,
+    # o original para comparação, fora do event loop (os locks de conversão
+    # e de PyMuPDF serializam o trabalho pesado)
+    original_path = f"{UPLOAD_DIR}/{compare_with}" if compare_with else None
+    if original_path and not os.path.exists(original_path):
+        original_path = None
+
+    cache_key = (filename, _file_key(file_path), _file_key(original_path))
+    cached = _validate_cache.get(cache_key)
+    if cached and time.time() - cached[0] < VALIDATE_CACHE_TTL:
+        _validate_cache.move_to_end(cache_key)
+        return copy.deepcopy(cached[1])
+
+    tasks = [asyncio.to_thread(_validate_docx, file_path, "_validation.pdf")]
+    if original_path:
+        tasks.append(asyncio.to_thread(_validate_docx, original_path, "_validation_original.pdf"))
+    results = await asyncio.gather(*tasks)
+    validation_result = results[0]
+    original_validation = results[1] if len(results) > 1 else None
+
+    if validation_result is None:
+        raise HTTPException(
+            status_code=500,
+            detail="Não foi possível converter o documento para PDF para validação"
+        )
 
-        # 5. Montar resposta final
-        response = {
-            "success": True,
-            "filename": filename,
-            "validation": validation_result,
-            "comparison": comparison_result,
-            "summary": {
-                "overall_score": validation_result["overall_score"],
-                "is_abnt_compliant": validation_result["overall_score"] >= 85,
-                "total_issues": len(validation_result["all_issues"]),
-                "critical_issues": len([i for i in validation_result["all_issues"] if i["severity"] == "critical"]),
-                "warnings": len([i for i in validation_result["all_issues"] if i["severity"] == "warning"])
+    # 3. Calcular melhorias em relação ao original
+    comparison_result = None
+    if original_validation is not None:
+        comparison_result = {
+            "original_score": original_validation["overall_score"],
+            "formatted_score": validation_result["overall_score"],
+            "improvement": validation_result["overall_score"] - original_validation["overall_score"],
+            "improvements_by_category": {
+                "margins": validation_result["margins"]["score"] - original_validation["margins"]["score"],
+                "fonts": validation_result["fonts"]["score"] - original_validation["fonts"]["score"],
+                "spacing": validation_result["spacing"]["score"] - original_validation["spacing"]["score"],
+                "alignment": validation_result["alignment"]["score"] - original_validation["alignment"]["score"]
             }
         }
 
-        return response
+    # 4. Montar resposta final
+    response = {
+        "success": True,
+        "filename": filename,
+        "validation": validation_result,
+        "comparison": comparison_result,
+        "summary": {
+            "overall_score": validation_result["overall_score"],
+            "is_abnt_compliant": validation_result["overall_score"] >= 85,
+            "total_issues": len(validation_result["all_issues"]),
+            "critical_issues": len([i for i in validation_result["all_issues"] if i["severity"] == "critical"]),
+            "warnings": len([i for i in validation_result["all_issues"] if i["severity"] == "warning"])
+        }
+    }
+
+    if VALIDATE_CACHE_TTL > 0:
+        _validate_cache[cache_key] = (time.time(), copy.deepcopy(response))
+        _validate_cache.move_to_end(cache_key)
+        while len(_validate_cache) > VALIDATE_CACHE_SIZE:
+            _validate_cache.popitem(last=False)
+
+    return response
+
 
+@router.get("/validate/{filename}")
+async def validate_document(filename: str, compare_with: Optional[str] = None):
+    """
+    NORMAEX 2.0 - FASE 4: Validação Visual de Formatação
+
+    Este endpoint valida se o documento formatado está em conformidade
+    com as normas ABNT usando análise visual do PDF.
+
+    Args:
+        filename: Nome do arquivo a ser validado
+        compare_with: (Opcional) Nome do arquivo original para comparação
+
+    Returns:
+        dict: Resultado completo da validação com scores 0-100
+
+    Validações realizadas:
+    - Margens (3cm top/left, 2cm bottom/right)
+    - Fontes (Arial/Times 12pt)
+    - Espaçamento (1.5 entre linhas)
+    - Alinhamento (justificado)
+    - Score geral de conformidade ABNT
+    """
+    try:
+        return await _validate_file(filename, compare_with)
     except HTTPException:
         raise
     except Exception as e:
@@ -1228,6 +1317,60 @@ async def validate_document(filename: str, compare_with: Optional[str] = None):
         raise HTTPException(status_code=500, detail="Erro interno ao validar documento")
 
 
+@router.get("/validate")
+async def validate_document_query(filename: str, compare_with: Optional[str] = None):
+    """
+    Mesma validação de GET /validate/{filename}, com o nome do arquivo em
+    query string (?filename=...&compare_with=...). Nomes com espaços ou
+    acentos não precisam ser codificados no caminho da URL.
+    """
+    return await validate_document(filename, compare_with)
+
+
+@router.post("/validate-batch")
+async def validate_documents_batch(request: ValidateBatchRequest):
+    """
+    Valida vários documentos em uma única requisição.
+
+    Cada item tem o mesmo formato dos parâmetros de GET /validate/{filename};
+    falhas em um item não interrompem os demais.
+
+    Returns:
+        dict: results com a resposta de cada item, na ordem enviada
+    """
+    if len(request.files) > MAX_VALIDATE_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {MAX_VALIDATE_BATCH} documentos por requisição"
+        )
+
+    # Itens validados um após o outro: a conversão já é serializada por lock e
+    # o PyMuPDF segura o GIL, então disparar todos ao mesmo tempo só ocuparia threads
+    results = []
+    for item in request.files:
+        try:
+            results.append(await _validate_file(item.filename, item.compare_with))
+        except HTTPException as e:
+            results.append({"success": False, "filename": item.filename, "error": e.detail})
+        except Exception as e:
+            print(f"[ERROR] validate-batch ({item.filename}): {e}")
+            results.append({"success": False, "filename": item.filename, "error": "Erro interno ao validar documento"})
+
+    return {"success": True, "results": results}
+
+
+@router.delete("/validate/cache")
+async def clear_validate_cache():
+    """
+    Esvazia o cache de resultados de validação (uso administrativo).
+    Resultados são reaproveitados enquanto o documento não muda; use após
+    alterar regras de validação sem reiniciar o servidor.
+    """
+    cleared = len(_validate_cache)
+    _validate_cache.clear()
+    return {"success": True, "cleared": cleared}
+
+
 @router.post("/intelligent-write")
 async def intelligent_write(request: WriteRequest):
     """
@@ -1304,6 +1447,68 @@ async def intelligent_write(request: WriteRequest):
         raise HTTPException(status_code=500, detail="Erro interno ao gerar texto inteligente")
 
 
+async def _stream_in_thread(make_chunks, request: Request):
+    """
+    Consome um gerador síncrono de chunks em uma thread produtora.
+
+    Os chunks chegam por uma asyncio.Queue, então o event loop não fica preso
+    nas chamadas bloqueantes ao Gemini. O gerador é iterado e fechado apenas
+    na thread produtora; desconexão do cliente ou cancelamento sinalizam um
+    threading.Event, verificado pela thread entre um chunk e outro.
+
+    Args:
+        make_chunks: Função sem argumentos que cria o gerador de chunks
+        request: Requisição SSE, usada para detectar desconexão
+
+    Yields:
+        str: Chunks na ordem gerada (encerra cedo se o cliente desconectar)
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # Event loop já encerrado
+
+    def produce():
+        chunks = make_chunks()
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                put(("chunk", chunk))
+            put(("done", None))
+        except Exception as e:
+            put(("error", e))
+        finally:
+            chunks.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            try:
+                kind, payload = await asyncio.wait_for(queue.get(), timeout=STREAM_DISCONNECT_POLL)
+            except asyncio.TimeoutError:
+                # Sem chunk novo: verifica a conexão mesmo enquanto o Gemini demora
+                if await request.is_disconnected():
+                    return
+                continue
+
+            if kind == "done":
+                return
+            if kind == "error":
+                raise payload
+            if await request.is_disconnected():
+                return
+            yield payload
+    finally:
+        # Fim, desconexão ou CancelledError: a thread para no próximo chunk
+        stop.set()
+
+
 @router.post("/intelligent-write-stream")
 async def intelligent_write_stream(request: Request):
     """
@@ -1332,19 +1537,28 @@ async def intelligent_write_stream(request: Request):
             document_text = extract_text_from_docx(file_path)
             document_structure = extract_complete_structure(file_path)
 
-            # Gerar texto com streaming
-            for chunk in write_structured_streaming(
-                document_context=document_text,
-                instruction=instruction,
-                section_type=section_type,
-                document_structure=document_structure
-            ):
+            # Gerar texto com streaming (chamadas ao Gemini em thread produtora)
+            chunks = _stream_in_thread(
+                lambda: write_structured_streaming(
+                    document_context=document_text,
+                    instruction=instruction,
+                    section_type=section_type,
+                    document_structure=document_structure
+                ),
+                request
+            )
+            async for chunk in chunks:
                 full_text += chunk
                 yield {
                     "event": "chunk",
                     "data": json.dumps({"text": chunk, "full_text": full_text})
                 }
 
+            # Cliente cancelou: interrompe a geração sem gravar o documento
+            if await request.is_disconnected():
+                print(f"[IntelligentWrite] Cliente desconectou, geração interrompida: {filename}")
+                return
+
             # Após terminar a geração, aplicar formatação estruturada
             write_result = {
                 "content": full_text,
@@ -1383,6 +1597,10 @@ async def intelligent_write_stream(request: Request):
                 })
             }
 
+        except asyncio.CancelledError:
+            # Conexão encerrada pelo servidor: a thread produtora já foi sinalizada
+            print(f"[IntelligentWrite] Streaming cancelado: {filename}")
+            raise
         except Exception as e:
             import traceback
             print(f"Erro no streaming inteligente: {traceback.format_exc()}")
@@ -0,0 +1,102 @@
+"""
+Kernels numéricos do DocumentValidator, compilados com Numba.
+A compilação acontece na primeira chamada; warmup() a antecipa para a
+inicialização do servidor.
+"""
+
+import numpy as np
+from numba import njit
+
+
+# ============================================
+# Kernels
+# ============================================
+
+@njit(fastmath=True)
+def _spacing_ratios_nb(line_bboxes, block_ids):
+    n = line_bboxes.shape[0]
+    out = np.empty(max(n - 1, 0), dtype=np.float32)
+    count = 0
+    for i in range(n - 1):
+        if block_ids[i] != block_ids[i + 1]:
+            continue
+        height = line_bboxes[i, 3] - line_bboxes[i, 1]
+        if height > 0:
+            out[count] = (line_bboxes[i + 1, 1] - line_bboxes[i, 3]) / height
+            count += 1
+    return out[:count]
+
+
+@njit(fastmath=True)
+def _margin_stats_nb(bboxes):
+    min_l = bboxes[0, 0]
+    min_t = bboxes[0, 1]
+    max_r = bboxes[0, 2]
+    max_b = bboxes[0, 3]
+    for i in range(1, bboxes.shape[0]):
+        min_l = min(min_l, bboxes[i, 0])
+        min_t = min(min_t, bboxes[i, 1])
+        max_r = max(max_r, bboxes[i, 2])
+        max_b = max(max_b, bboxes[i, 3])
+    return min_l, min_t, max_r, max_b
+
+
+@njit(fastmath=True)
+def _line_margin_stds_nb(line_bboxes):
+    # Welford: média e soma dos quadrados dos desvios em uma única passada
+    n = line_bboxes.shape[0]
+    if n < 2:
+        return 0.0, 0.0
+    mean_l = 0.0
+    mean_r = 0.0
+    m2_l = 0.0
+    m2_r = 0.0
+    for i in range(n):
+        k = i + 1
+        delta_l = line_bboxes[i, 0] - mean_l
+        mean_l += delta_l / k
+        m2_l += delta_l * (line_bboxes[i, 0] - mean_l)
+        delta_r = line_bboxes[i, 2] - mean_r
+        mean_r += delta_r / k
+        m2_r += delta_r * (line_bboxes[i, 2] - mean_r)
+    return np.sqrt(m2_l / (n - 1)), np.sqrt(m2_r / (n - 1))
+
+
+# ============================================
+# API pública
+# ============================================
+
+def spacing_ratios(line_bboxes: np.ndarray, block_ids: np.ndarray) -> np.ndarray:
+    """
+    Espaçamento relativo (gap / altura) entre linhas consecutivas do mesmo bloco.
+    Ignora linhas com altura nula.
+    """
+    return _spacing_ratios_nb(line_bboxes, block_ids)
+
+
+def margin_stats(bboxes: np.ndarray) -> tuple:
+    """
+    Extremos dos blocos de texto: (min x0, min y0, max x1, max y1).
+    Requer ao menos um bbox.
+    """
+    return tuple(float(v) for v in _margin_stats_nb(bboxes))
+
+
+def line_margin_stds(line_bboxes: np.ndarray) -> tuple:
+    """
+    Desvio padrão amostral de x0 e x1 das linhas (margens esquerda e direita).
+    Retorna (0.0, 0.0) com menos de duas linhas.
+    """
+    return tuple(float(v) for v in _line_margin_stds_nb(line_bboxes))
+
+
+def warmup():
+    """
+    Executa cada kernel uma vez com dados mínimos, compilando as versões JIT
+    antes da primeira validação (sem cache em disco: o pacote pode ser somente leitura).
+    """
+    bboxes = np.array([[0, 0, 1, 1], [0, 2, 1, 3]], dtype=np.float32)
+    block_ids = np.zeros(2, dtype=np.int32)
+    spacing_ratios(bboxes, block_ids)
+    margin_stats(bboxes)
+    line_margin_stds(bboxes)
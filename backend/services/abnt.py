@@ -16,6 +16,13 @@ SECTION_PATTERNS = {
 }
 
 
+def _preview(text: str, limit: int) -> str:
+    """Início do texto para exibição, com reticências se foi cortado"""
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
 def extract_text_from_docx(file_path: str) -> str:
     doc = Document(file_path)
     full_text = []
@@ -119,10 +126,12 @@ def analyze_document(file_path: str) -> dict:
 
     for idx, paragraph in enumerate(doc.paragraphs):
         para_num = idx + 1
-        para_preview = paragraph.text[:50] + "..." if len(paragraph.text) > 50 else paragraph.text
+        # paragraph.text é recalculado a partir dos runs a cada acesso: ler uma vez
+        para_text = paragraph.text
+        para_preview = _preview(para_text, 50)
 
         # Verificar estilo
-        if paragraph.style.name != 'Normal' and paragraph.text.strip():
+        if paragraph.style.name != 'Normal' and para_text.strip():
             if not paragraph.style.name.lower().startswith('heading'):
                 wrong_style_paragraphs.append({
                     "paragraph": para_num,
@@ -132,7 +141,7 @@ def analyze_document(file_path: str) -> dict:
 
         # Verificar recuo
         if paragraph.paragraph_format.first_line_indent != Cm(1.25):
-            if not paragraph.style.name.lower().startswith('heading') and paragraph.text.strip():
+            if not paragraph.style.name.lower().startswith('heading') and para_text.strip():
                 current_indent = paragraph.paragraph_format.first_line_indent.cm if paragraph.paragraph_format.first_line_indent else 0
                 no_indent_paragraphs.append({
                     "paragraph": para_num,
@@ -147,14 +156,14 @@ def analyze_document(file_path: str) -> dict:
                     "paragraph": para_num,
                     "run": run_idx + 1,
                     "issue": f"Fonte '{run.font.name}' ao invés de Times New Roman ou Arial",
-                    "text_preview": run.text[:30] + "..." if len(run.text) > 30 else run.text
+                    "text_preview": _preview(run.text, 30)
                 })
             elif run.font.size and run.font.size != Pt(12):
                 wrong_runs_details.append({
                     "paragraph": para_num,
                     "run": run_idx + 1,
                     "issue": f"Tamanho {run.font.size.pt:.0f}pt ao invés de 12pt",
-                    "text_preview": run.text[:30] + "..." if len(run.text) > 30 else run.text
+                    "text_preview": _preview(run.text, 30)
                 })
 
     # Adicionar issues com DETALHES dos parágrafos afetados
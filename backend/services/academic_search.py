@@ -4,6 +4,7 @@ Busca papers reais no OpenAlex, Crossref e Semantic Scholar.
 """
 
 import httpx
+import orjson
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 import logging
@@ -11,16 +12,91 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Pool de conexões compartilhado entre as buscas (keep-alive com as APIs).
+# Com HTTP/2, requisições simultâneas ao mesmo host dividem uma conexão.
+HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+
+# Timeout de conexão curto e separado do de leitura: host fora do ar falha rápido
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
+
+# Novas tentativas em falhas transitórias: erros de conexão (no transporte)
+# e respostas de gateway, com backoff exponencial
+CONNECT_RETRIES = 2
+RETRY_STATUSES = {502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3  # segundos; dobra a cada tentativa
+
 
 class AcademicSearchService:
     OPENALEX_URL = "https://api.openalex.org/works"
     CROSSREF_URL = "https://api.crossref.org/works"
     SEMANTIC_SCHOLAR_URL = "https://api.semanticscholar.org/graph/v1/paper/search"
 
+    # Parâmetros fixos de cada API, montados uma vez; cada busca só
+    # acrescenta a query e o limite
+    OPENALEX_PARAMS = {
+        "sort": "relevance_score:desc",
+        "filter": "type:article|book|dissertation|thesis"
+    }
+    CROSSREF_PARAMS = {
+        "sort": "relevance",
+        "select": "DOI,title,author,published-print,published-online,container-title,type,is-referenced-by-count"
+    }
+    SEMANTIC_SCHOLAR_PARAMS = {
+        "fields": "title,authors,year,externalIds,journal,citationCount"
+    }
+
     def __init__(self):
         self.headers = {
             "User-Agent": "Normaex/1.0 (mailto:contato@normaex.com.br)"
         }
+        # Um cliente por event loop: as conexões pertencem ao loop em que
+        # foram abertas (servidor ou asyncio.run de scripts)
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Cliente HTTP do event loop atual, reutilizado entre chamadas para
+        manter as conexões abertas. Clientes de loops já encerrados são
+        descartados; quem cria o próprio loop deve chamar aclose antes de
+        encerrá-lo.
+        """
+        loop = asyncio.get_running_loop()
+        for stale_loop in [l for l in self._clients if l.is_closed()]:
+            del self._clients[stale_loop]
+
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                transport=httpx.AsyncHTTPTransport(
+                    retries=CONNECT_RETRIES,
+                    limits=HTTP_LIMITS,
+                    http2=True,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _get(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """GET com novas tentativas (backoff) para respostas 502/503/504"""
+        client = self._get_client()
+        for attempt in range(MAX_RETRIES + 1):
+            response = await client.get(url, params=params, headers=headers)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+    async def aclose(self):
+        """Fecha o cliente HTTP do event loop atual (shutdown da aplicação ou fim de um asyncio.run)"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
 
     # ============================================
     # BUSCA MULTI-FONTE
@@ -85,46 +161,40 @@ class AcademicSearchService:
     ) -> List[Dict[str, Any]]:
         """Busca no OpenAlex (gratuito, sem key)."""
         try:
-            params = {
-                "search": query,
-                "per-page": limit,
-                "sort": "relevance_score:desc",
-                "filter": "type:article|book|dissertation|thesis"
-            }
+            params = {**self.OPENALEX_PARAMS, "search": query, "per-page": limit}
             if year_min:
                 params["filter"] += f",publication_year:>{year_min}"
 
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(self.OPENALEX_URL, params=params, headers=self.headers)
-                if response.status_code != 200:
-                    return []
-
-                data = response.json()
-                papers = []
-                for item in data.get("results", []):
-                    authors = []
-                    for authorship in item.get("authorships", []):
-                        name = authorship.get("author", {}).get("display_name")
-                        if name:
-                            parts = name.split()
-                            if len(parts) >= 2:
-                                authors.append(f"{parts[-1].upper()}, {' '.join(parts[:-1])}")
-                            else:
-                                authors.append(name.upper())
-
-                    papers.append({
-                        "title": item.get("title", ""),
-                        "authors": authors,
-                        "year": item.get("publication_year"),
-                        "doi": (item.get("doi") or "").replace("https://doi.org/", ""),
-                        "journal": (item.get("primary_location", {}) or {}).get("source", {}).get("display_name", ""),
-                        "cited_by_count": item.get("cited_by_count", 0),
-                        "abstract": self._clean_abstract(item.get("abstract_inverted_index")),
-                        "source_api": "openalex"
-                    })
-
-                print(f"[OpenAlex] {len(papers)} papers para '{query[:40]}'")
-                return papers
+            response = await self._get(self.OPENALEX_URL, params, self.headers)
+            if response.status_code != 200:
+                return []
+
+            data = orjson.loads(response.content)
+            papers = []
+            for item in data.get("results", []):
+                authors = []
+                for authorship in item.get("authorships", []):
+                    name = authorship.get("author", {}).get("display_name")
+                    if name:
+                        parts = name.split()
+                        if len(parts) >= 2:
+                            authors.append(f"{parts[-1].upper()}, {' '.join(parts[:-1])}")
+                        else:
+                            authors.append(name.upper())
+
+                papers.append({
+                    "title": item.get("title", ""),
+                    "authors": authors,
+                    "year": item.get("publication_year"),
+                    "doi": (item.get("doi") or "").replace("https://doi.org/", ""),
+                    "journal": (item.get("primary_location", {}) or {}).get("source", {}).get("display_name", ""),
+                    "cited_by_count": item.get("cited_by_count", 0),
+                    "abstract": self._clean_abstract(item.get("abstract_inverted_index")),
+                    "source_api": "openalex"
+                })
+
+            print(f"[OpenAlex] {len(papers)} papers para '{query[:40]}'")
+            return papers
         except Exception as e:
             logger.error(f"[OpenAlex] Erro: {e}")
             return []
@@ -136,49 +206,43 @@ class AcademicSearchService:
     async def search_crossref(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Busca no Crossref (gratuito, sem key)."""
         try:
-            params = {
-                "query": query,
-                "rows": limit,
-                "sort": "relevance",
-                "select": "DOI,title,author,published-print,published-online,container-title,type,is-referenced-by-count"
-            }
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(self.CROSSREF_URL, params=params, headers=self.headers)
-                if response.status_code != 200:
-                    return []
-
-                data = response.json()
-                papers = []
-                for item in data.get("message", {}).get("items", []):
-                    authors = []
-                    for author in item.get("author", []):
-                        family = author.get("family", "")
-                        given = author.get("given", "")
-                        if family:
-                            authors.append(f"{family.upper()}, {given}")
-
-                    date_parts = (
-                        item.get("published-print", {}).get("date-parts", [[None]]) or
-                        item.get("published-online", {}).get("date-parts", [[None]])
-                    )
-                    year = date_parts[0][0] if date_parts and date_parts[0] else None
-
-                    title_list = item.get("title", [])
-                    title = title_list[0] if title_list else "Sem título"
-                    container = item.get("container-title", [])
-
-                    papers.append({
-                        "title": title,
-                        "authors": authors,
-                        "year": year,
-                        "doi": item.get("DOI", ""),
-                        "journal": container[0] if container else "",
-                        "cited_by_count": item.get("is-referenced-by-count", 0),
-                        "source_api": "crossref"
-                    })
-
-                print(f"[Crossref] {len(papers)} papers para '{query[:40]}'")
-                return papers
+            params = {**self.CROSSREF_PARAMS, "query": query, "rows": limit}
+            response = await self._get(self.CROSSREF_URL, params, self.headers)
+            if response.status_code != 200:
+                return []
+
+            data = orjson.loads(response.content)
+            papers = []
+            for item in data.get("message", {}).get("items", []):
+                authors = []
+                for author in item.get("author", []):
+                    family = author.get("family", "")
+                    given = author.get("given", "")
+                    if family:
+                        authors.append(f"{family.upper()}, {given}")
+
+                date_parts = (
+                    item.get("published-print", {}).get("date-parts", [[None]]) or
+                    item.get("published-online", {}).get("date-parts", [[None]])
+                )
+                year = date_parts[0][0] if date_parts and date_parts[0] else None
+
+                title_list = item.get("title", [])
+                title = title_list[0] if title_list else "Sem título"
+                container = item.get("container-title", [])
+
+                papers.append({
+                    "title": title,
+                    "authors": authors,
+                    "year": year,
+                    "doi": item.get("DOI", ""),
+                    "journal": container[0] if container else "",
+                    "cited_by_count": item.get("is-referenced-by-count", 0),
+                    "source_api": "crossref"
+                })
+
+            print(f"[Crossref] {len(papers)} papers para '{query[:40]}'")
+            return papers
         except Exception as e:
             logger.error(f"[Crossref] Erro: {e}")
             return []
@@ -190,44 +254,39 @@ class AcademicSearchService:
     async def search_semantic_scholar(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Busca no Semantic Scholar (gratuito, sem key)."""
         try:
-            params = {
-                "query": query,
-                "limit": limit,
-                "fields": "title,authors,year,externalIds,journal,citationCount"
-            }
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.get(self.SEMANTIC_SCHOLAR_URL, params=params)
-                if response.status_code != 200:
-                    return []
-
-                data = response.json()
-                papers = []
-                for item in data.get("data", []):
-                    authors = []
-                    for author in item.get("authors", []):
-                        name = author.get("name", "")
-                        if name:
-                            parts = name.split()
-                            if len(parts) >= 2:
-                                authors.append(f"{parts[-1].upper()}, {' '.join(parts[:-1])}")
-                            else:
-                                authors.append(name.upper())
-
-                    doi = (item.get("externalIds") or {}).get("DOI", "")
-                    journal_info = item.get("journal") or {}
-
-                    papers.append({
-                        "title": item.get("title", "Sem título"),
-                        "authors": authors,
-                        "year": item.get("year"),
-                        "doi": doi,
-                        "journal": journal_info.get("name", ""),
-                        "cited_by_count": item.get("citationCount", 0),
-                        "source_api": "semantic_scholar"
-                    })
-
-                print(f"[SemanticScholar] {len(papers)} papers para '{query[:40]}'")
-                return papers
+            params = {**self.SEMANTIC_SCHOLAR_PARAMS, "query": query, "limit": limit}
+            response = await self._get(self.SEMANTIC_SCHOLAR_URL, params)
+            if response.status_code != 200:
+                return []
+
+            data = orjson.loads(response.content)
+            papers = []
+            for item in data.get("data", []):
+                authors = []
+                for author in item.get("authors", []):
+                    name = author.get("name", "")
+                    if name:
+                        parts = name.split()
+                        if len(parts) >= 2:
+                            authors.append(f"{parts[-1].upper()}, {' '.join(parts[:-1])}")
+                        else:
+                            authors.append(name.upper())
+
+                doi = (item.get("externalIds") or {}).get("DOI", "")
+                journal_info = item.get("journal") or {}
+
+                papers.append({
+                    "title": item.get("title", "Sem título"),
+                    "authors": authors,
+                    "year": item.get("year"),
+                    "doi": doi,
+                    "journal": journal_info.get("name", ""),
+                    "cited_by_count": item.get("citationCount", 0),
+                    "source_api": "semantic_scholar"
+                })
+
+            print(f"[SemanticScholar] {len(papers)} papers para '{query[:40]}'")
+            return papers
         except Exception as e:
             logger.error(f"[SemanticScholar] Erro: {e}")
             return []
@@ -19,6 +19,51 @@ if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
 
 
+# Parte fixa do prompt de write_with_structure (independe do documento e da instrução)
+WRITE_PROMPT_PREFIX = """
+Você é um escritor acadêmico especialista em normas ABNT.
+
+TAREFA:
+Escreva o texto acadêmico solicitado (INSTRUÇÃO DO USUÁRIO, ao final) seguindo ABNT E especifique a formatação estrutural completa.
+
+REGRAS ABNT:
+- Fonte: Arial ou Times New Roman 12pt
+- Espaçamento: 1.5 entre linhas
+- Alinhamento: Justificado
+- Recuo primeira linha: 1.25cm
+- Texto acadêmico formal
+- Citações quando necessário
+
+IMPORTANTE:
+- Escreva de forma acadêmica e formal
+- Use vocabulário técnico apropriado
+- Mantenha coesão com o texto existente
+- Gere texto de qualidade (mínimo 150 palavras)
+
+Retorne APENAS um JSON válido no seguinte formato
+(em "section", use o TIPO DE SEÇÃO informado ao final):
+```json
+{
+  "content": "O texto completo aqui com múltiplos parágrafos separados por \\n\\n",
+  "structure": {
+    "type": "body",
+    "formatting": {
+      "font": "Arial",
+      "size": 12,
+      "bold": false,
+      "italic": false,
+      "alignment": "justify",
+      "spacing": 1.5,
+      "indent": 1.25
+    },
+    "paragraphs_count": 3,
+    "section": "TIPO DE SEÇÃO"
+  }
+}
+```
+"""
+
+
 def write_with_structure(
     document_context: str,
     instruction: str,
@@ -58,12 +103,13 @@ def write_with_structure(
         "last_paragraph_index": len(document_structure.get("paragraphs", [])) - 1
     }
 
-    prompt = f"""
-Você é um escritor acadêmico especialista em normas ABNT.
-
+    # Ordem do prompt: partes fixas primeiro, depois o documento e por último
+    # a instrução. Chamadas sobre o mesmo documento compartilham o prefixo,
+    # aproveitado pelo cache implícito de contexto do Gemini.
+    prompt = f"""{WRITE_PROMPT_PREFIX}
 CONTEXTO DO DOCUMENTO:
 ```
-{document_context[-2000:]}  # Últimos 2000 caracteres para contexto
+{document_context[-2000:]}
 ```
 
 ESTRUTURA DO DOCUMENTO:
@@ -76,44 +122,6 @@ INSTRUÇÃO DO USUÁRIO:
 
 TIPO DE SEÇÃO: {section_type}
 
-TAREFA:
-Escreva o texto acadêmico solicitado seguindo ABNT E especifique a formatação estrutural completa.
-
-REGRAS ABNT:
-- Fonte: Arial ou Times New Roman 12pt
-- Espaçamento: 1.5 entre linhas
-- Alinhamento: Justificado
-- Recuo primeira linha: 1.25cm
-- Texto acadêmico formal
-- Citações quando necessário
-
-IMPORTANTE:
-- Escreva de forma acadêmica e formal
-- Use vocabulário técnico apropriado
-- Mantenha coesão com o texto existente
-- Gere texto de qualidade (mínimo 150 palavras)
-
-Retorne APENAS um JSON válido no seguinte formato:
-```json
-{{
-  "content": "O texto completo aqui com múltiplos parágrafos separados por \\n\\n",
-  "structure": {{
-    "type": "body",
-    "formatting": {{
-      "font": "Arial",
-      "size": 12,
-      "bold": false,
-      "italic": false,
-      "alignment": "justify",
-      "spacing": 1.5,
-      "indent": 1.25
-    }},
-    "paragraphs_count": 3,
-    "section": "{section_type}"
-  }}
-}}
-```
-
 ATENÇÃO: Retorne APENAS o JSON, sem markdown, sem explicações adicionais.
 """
 
@@ -266,6 +274,10 @@ def write_structured_streaming(
 
     Yields:
         str: Chunks de texto conforme são gerados
+
+    Raises:
+        Exception: Se a geração falhar (o endpoint SSE envia um evento de erro
+            em vez de tratar a mensagem como texto gerado)
     """
     # Verificar se API key está configurada
     if not GOOGLE_API_KEY:
@@ -278,18 +290,10 @@ def write_structured_streaming(
         "hierarchy": document_structure.get("hierarchy", [])[:5]
     }
 
+    # Mesma ordem de write_with_structure: fixo, documento, instrução
     prompt = f"""
 Você é um escritor acadêmico especialista em ABNT.
 
-CONTEXTO:
-{document_context[-1500:]}
-
-ESTRUTURA:
-Total de parágrafos: {structure_summary['total_paragraphs']}
-
-INSTRUÇÃO: {instruction}
-SEÇÃO: {section_type}
-
 Escreva texto acadêmico seguindo ABNT:
 - Arial/Times 12pt
 - Espaçamento 1.5
@@ -299,6 +303,15 @@ Escreva texto acadêmico seguindo ABNT:
 - Tom formal e técnico
 
 Escreva APENAS o texto, sem JSON, sem formatação extra.
+
+CONTEXTO:
+{document_context[-1500:]}
+
+ESTRUTURA:
+Total de parágrafos: {structure_summary['total_paragraphs']}
+
+INSTRUÇÃO: {instruction}
+SEÇÃO: {section_type}
 """
 
     try:
@@ -310,7 +323,7 @@ Escreva APENAS o texto, sem JSON, sem formatação extra.
 
     except Exception as e:
         print(f"Erro no streaming: {e}")
-        yield f"[ERRO: {str(e)}]"
+        raise
 
 
 def create_action_plan_for_writing(
@@ -8,8 +8,18 @@ from docx.shared import Pt, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import fitz  # PyMuPDF
 import os
+import threading
 from typing import Dict, List, Optional, Any
 
+try:
+    import pythoncom
+except ImportError:  # pywin32 é opcional; só existe no Windows (Word via docx2pdf)
+    pythoncom = None
+
+# Conversões DOCX -> PDF uma de cada vez: Word (docx2pdf) e LibreOffice
+# não aceitam instâncias concorrentes com o mesmo perfil de usuário
+_convert_lock = threading.Lock()
+
 
 def extract_complete_structure(docx_path: str) -> Dict[str, Any]:
     """
@@ -440,7 +450,7 @@ def quick_abnt_check(structure: Dict[str, Any]) -> Dict[str, Any]:
 
 def convert_docx_to_pdf(docx_path: str, pdf_path: str) -> bool:
     """
-    Converte DOCX para PDF
+    Converte DOCX para PDF (uma conversão por vez, de qualquer thread)
 
     Args:
         docx_path: Caminho do arquivo DOCX
@@ -453,11 +463,25 @@ def convert_docx_to_pdf(docx_path: str, pdf_path: str) -> bool:
     if not os.path.exists(docx_path):
         return False
 
+    with _convert_lock:
+        return _convert_docx_to_pdf(docx_path, pdf_path)
+
+
+def _convert_docx_to_pdf(docx_path: str, pdf_path: str) -> bool:
+    """Conversão propriamente dita; chamada por convert_docx_to_pdf sob _convert_lock"""
     try:
         # Tentar usar docx2pdf (Windows)
         try:
             from docx2pdf import convert
-            convert(docx_path, pdf_path)
+            # A automação COM do Word exige CoInitialize na thread que a usa
+            # (as validações convertem em threads de trabalho)
+            if pythoncom is not None:
+                pythoncom.CoInitialize()
+            try:
+                convert(docx_path, pdf_path)
+            finally:
+                if pythoncom is not None:
+                    pythoncom.CoUninitialize()
             # Verificar se PDF foi criado
             return os.path.exists(pdf_path)
         except ImportError:
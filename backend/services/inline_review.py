@@ -4,12 +4,23 @@ Focado em correções rápidas de gramática, estilo e clareza para trechos sele
 """
 
 import google.generativeai as genai
+import asyncio
 import os
-import json
+import re
+import orjson
+
 from services.ai import get_model
 from services.sanitizer import sanitize_for_prompt
 
-def review_selection(
+# Bloco de código markdown (```json, ```JSON, ``` ...) no início da resposta do
+# modelo, até a última cerca (o modelo às vezes acrescenta texto depois dela)
+_FENCE_RE = re.compile(r'^\s*```[\w-]*\s*(.*)```', re.DOTALL)
+
+# Limite de revisões simultâneas enviadas ao Gemini (respeita rate limit)
+_review_semaphore = asyncio.Semaphore(8)
+
+
+async def review_selection_async(
     text: str,
     instruction: str = "",
     format_type: str = "abnt"
@@ -42,16 +53,17 @@ Retorne APENAS um JSON com o seguinte formato:
 Se o texto já estiver excelente, retorne o texto original e explique que não precisa de alterações.
 """
 
-        response = model.generate_content(prompt, generation_config={
-            "max_output_tokens": 2048,
-            "temperature": 0.2, # Baixa temperatura para preservação do sentido
-        })
+        async with _review_semaphore:
+            response = await model.generate_content_async(prompt, generation_config={
+                "max_output_tokens": 2048,
+                "temperature": 0.2, # Baixa temperatura para preservação do sentido
+            })
+
+        raw_text = response.text
+        fence = _FENCE_RE.match(raw_text)
+        result_text = fence.group(1).strip() if fence else raw_text.strip()
 
-        result_text = response.text.strip()
-        if result_text.startswith("```"):
-            result_text = result_text.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-            
-        result_json = json.loads(result_text)
+        result_json = orjson.loads(result_text)
         result_json["original_text"] = text
         return result_json
 
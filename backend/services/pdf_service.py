@@ -5,11 +5,23 @@ Utiliza PyMuPDF (fitz) para extração eficiente de texto
 
 import fitz  # PyMuPDF
 import os
+import re
 from typing import Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Evita que o MuPDF escreva avisos no stderr durante a extração
+fitz.TOOLS.mupdf_display_errors(False)
+
+# Sequências de caracteres não-brancos (equivalente às palavras de str.split())
+_WORD_RE = re.compile(r'\S+')
+
+
+def count_words(text: str) -> int:
+    """Conta palavras sem materializar a lista de tokens de str.split()"""
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
 
 class PDFService:
     """Serviço para processamento e extração de texto de PDFs"""
@@ -43,12 +55,16 @@ class PDFService:
             for page_num, page in enumerate(doc):
                 page_text = page.get_text("text")
                 if page_text.strip():
-                    text_parts.append(f"[Página {page_num + 1}]\n{page_text}")
+                    if text_parts:
+                        text_parts.append("\n\n")
+                    text_parts.append(f"[Página {page_num + 1}]\n")
+                    text_parts.append(page_text)
 
             doc.close()
 
-            full_text = "\n\n".join(text_parts)
-            word_count = len(full_text.split()) if full_text else 0
+            # Um único join sobre marcadores e conteúdos (sem concatenar por página)
+            full_text = "".join(text_parts)
+            word_count = count_words(full_text)
 
             logger.info(f"PDF extraído: {page_count} páginas, {word_count} palavras")
             return full_text, page_count, word_count
@@ -68,20 +84,104 @@ class PDFService:
 
         Returns:
             Tuple contendo texto (limitado), páginas e palavras
+
+        Note:
+            A extração para assim que o limite é atingido, evitando
+            processar todas as páginas de PDFs muito grandes.
         """
-        full_text, page_count, word_count = PDFService.extract_text(file_path)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
 
-        if len(full_text) > max_chars:
+        try:
+            doc = fitz.open(file_path)
+            try:
+                return PDFService._extract_limited_from_doc(doc, max_chars)
+            finally:
+                doc.close()
+        except Exception as e:
+            logger.error(f"Erro ao extrair texto do PDF: {e}")
+            raise
+
+    @staticmethod
+    def _extract_limited_from_doc(doc: fitz.Document, max_chars: int) -> Tuple[str, int, int]:
+        """
+        Extrai texto de um documento já aberto, parando ao atingir max_chars.
+
+        Returns:
+            Tuple contendo texto (limitado), páginas e palavras
+        """
+        text_parts = []
+        page_count = len(doc)
+        total_len = 0
+
+        for page_num in range(page_count):
+            page_text = doc[page_num].get_text("text")
+            if not page_text.strip():
+                continue
+            if text_parts:
+                text_parts.append("\n\n")
+                total_len += 2
+            marker = f"[Página {page_num + 1}]\n"
+            text_parts.append(marker)
+            text_parts.append(page_text)
+            total_len += len(marker) + len(page_text)
+            if total_len > max_chars:
+                break
+
+        full_text = "".join(text_parts)
+
+        if total_len > max_chars:
             truncated = full_text[:max_chars]
             # Tentar cortar em um espaço para não quebrar palavras
             last_space = truncated.rfind(" ")
             if last_space > max_chars * 0.9:
                 truncated = truncated[:last_space]
             truncated += "\n\n[... texto truncado ...]"
-            return truncated, page_count, len(truncated.split())
+            return truncated, page_count, count_words(truncated)
 
+        word_count = count_words(full_text)
+        logger.info(f"PDF extraído: {page_count} páginas, {word_count} palavras")
         return full_text, page_count, word_count
 
+    @staticmethod
+    def process(file_path: str, max_chars: int = 50000) -> dict:
+        """
+        Valida, obtém informações e extrai o texto (limitado) de um PDF
+        abrindo o arquivo uma única vez.
+
+        Args:
+            file_path: Caminho do arquivo PDF
+            max_chars: Limite máximo de caracteres do texto
+
+        Returns:
+            Dict com text, page_count, word_count, metadata e file_size
+
+        Raises:
+            FileNotFoundError: Se o arquivo não existir
+            ValueError: Se o PDF não tiver páginas
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+
+        try:
+            doc = fitz.open(file_path)
+            try:
+                if len(doc) == 0:
+                    raise ValueError("PDF inválido ou sem páginas")
+                text, page_count, word_count = PDFService._extract_limited_from_doc(doc, max_chars)
+                return {
+                    "text": text,
+                    "page_count": page_count,
+                    "word_count": word_count,
+                    "metadata": doc.metadata,
+                    "file_size": os.path.getsize(file_path),
+                }
+            finally:
+                doc.close()
+        except Exception as e:
+            logger.error(f"Erro ao processar PDF: {e}")
+            raise
+
     @staticmethod
     def get_pdf_info(file_path: str) -> dict:
         """
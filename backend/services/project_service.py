@@ -1,11 +1,13 @@
 """
 Project Service - Gerenciamento de projetos e PDFs
-Persiste dados em arquivos JSON para simplicidade
+Persiste dados em SQLite (uma linha por projeto e por PDF)
 """
 
 import os
 import json
 import shutil
+import sqlite3
+from collections import OrderedDict
 from typing import List, Optional
 from datetime import datetime
 import logging
@@ -26,60 +28,211 @@ logger = logging.getLogger(__name__)
 # Diretórios de armazenamento
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PROJECTS_DIR = os.path.join(BASE_DIR, "data", "projects")
+PROJECTS_DB = os.path.join(BASE_DIR, "data", "projects.db")
+# Arquivo JSON legado, importado uma única vez para o banco
 PROJECTS_FILE = os.path.join(BASE_DIR, "data", "projects.json")
 PDF_UPLOADS_DIR = os.path.join(BASE_DIR, "uploads", "pdfs")
 
+# Quantidade máxima de projetos mantidos em memória
+PROJECT_CACHE_SIZE = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS pdfs (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    word_count INTEGER NOT NULL DEFAULT 0,
+    extracted_text_path TEXT,
+    error_message TEXT,
+    upload_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pdfs_project ON pdfs(project_id);
+"""
+
+
+def _write_bytes(path: str, content: bytes):
+    """
+    Grava bytes já em memória direto no descritor, sem o buffer do
+    BufferedWriter. os.write pode gravar parcialmente, então repete até o fim.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(content)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
 
 class ProjectService:
     """Serviço para gerenciamento de projetos e PDFs"""
 
     def __init__(self):
         self._ensure_directories()
-        self._projects: dict[str, Project] = {}
-        self._load_projects()
+        self._cache: "OrderedDict[str, Project]" = OrderedDict()
+        self._conn = self._connect()
+        self._migrate_legacy_json()
 
     def _ensure_directories(self):
         """Garante que os diretórios necessários existam"""
         os.makedirs(PROJECTS_DIR, exist_ok=True)
         os.makedirs(PDF_UPLOADS_DIR, exist_ok=True)
-        os.makedirs(os.path.dirname(PROJECTS_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(PROJECTS_DB), exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre o banco SQLite em modo WAL e cria as tabelas"""
+        conn = sqlite3.connect(PROJECTS_DB, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _migrate_legacy_json(self):
+        """Importa o projects.json legado se o banco ainda estiver vazio"""
+        if not os.path.exists(PROJECTS_FILE):
+            return
+        if self._conn.execute("SELECT 1 FROM projects LIMIT 1").fetchone():
+            return
 
-    def _load_projects(self):
-        """Carrega projetos do arquivo JSON"""
-        if os.path.exists(PROJECTS_FILE):
+        try:
+            with open(PROJECTS_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            with self._conn:
+                for proj_data in data.get("projects", []):
+                    project = Project(**proj_data)
+                    self._insert_project(project)
+                    for pdf in project.pdfs:
+                        self._write_text_sidecar(project.id, pdf)
+                        self._insert_pdf(project.id, pdf)
+            logger.info(f"Migrados {len(data.get('projects', []))} projetos de {PROJECTS_FILE}")
+        except Exception as e:
+            logger.error(f"Erro ao migrar projetos do JSON: {e}")
+
+    # ============================================
+    # Acesso ao banco
+    # ============================================
+
+    def _insert_project(self, project: Project):
+        self._conn.execute(
+            "INSERT INTO projects (id, name, description, created_at, updated_at, is_active) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                project.id,
+                project.name,
+                project.description,
+                project.created_at.isoformat(),
+                project.updated_at.isoformat(),
+                int(project.is_active),
+            ),
+        )
+
+    def _insert_pdf(self, project_id: str, pdf: PDFDocument):
+        self._conn.execute(
+            "INSERT INTO pdfs (id, project_id, filename, file_path, status, page_count, "
+            "word_count, extracted_text_path, error_message, upload_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                pdf.id,
+                project_id,
+                pdf.filename,
+                pdf.file_path,
+                pdf.status.value,
+                pdf.page_count,
+                pdf.word_count,
+                pdf.extracted_text_path,
+                pdf.error_message,
+                pdf.upload_date.isoformat(),
+            ),
+        )
+
+    def _write_text_sidecar(self, project_id: str, pdf: PDFDocument):
+        """
+        Move o texto extraído para uploads/pdfs/<project_id>/<pdf_id>.txt,
+        mantendo em memória apenas o caminho (carregado sob demanda via load_text).
+        """
+        if pdf.extracted_text is None:
+            return
+        project_pdf_dir = os.path.join(PDF_UPLOADS_DIR, project_id)
+        os.makedirs(project_pdf_dir, exist_ok=True)
+        text_path = os.path.join(project_pdf_dir, f"{pdf.id}.txt")
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write(pdf.extracted_text)
+        pdf.extracted_text_path = text_path
+        pdf.extracted_text = None
+
+    def _remove_pdf_files(self, pdf: PDFDocument):
+        """Remove do disco o arquivo PDF e o texto extraído"""
+        for path in (pdf.file_path, pdf.extracted_text_path):
             try:
-                with open(PROJECTS_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    for proj_data in data.get("projects", []):
-                        # Converter strings de data para datetime
-                        if isinstance(proj_data.get("created_at"), str):
-                            proj_data["created_at"] = datetime.fromisoformat(proj_data["created_at"])
-                        if isinstance(proj_data.get("updated_at"), str):
-                            proj_data["updated_at"] = datetime.fromisoformat(proj_data["updated_at"])
-                        for pdf in proj_data.get("pdfs", []):
-                            if isinstance(pdf.get("upload_date"), str):
-                                pdf["upload_date"] = datetime.fromisoformat(pdf["upload_date"])
-                        project = Project(**proj_data)
-                        self._projects[project.id] = project
-                logger.info(f"Carregados {len(self._projects)} projetos")
+                if path and os.path.exists(path):
+                    os.remove(path)
             except Exception as e:
-                logger.error(f"Erro ao carregar projetos: {e}")
-                self._projects = {}
-        else:
-            self._projects = {}
+                logger.warning(f"Erro ao deletar arquivo do PDF {pdf.id}: {e}")
 
-    def _save_projects(self):
-        """Salva projetos no arquivo JSON"""
-        try:
-            data = {
-                "projects": [proj.model_dump() for proj in self._projects.values()]
-            }
-            with open(PROJECTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
-            logger.info(f"Salvos {len(self._projects)} projetos")
-        except Exception as e:
-            logger.error(f"Erro ao salvar projetos: {e}")
-            raise
+    def _touch_project(self, project: Project):
+        """Atualiza updated_at do projeto em memória e no banco"""
+        project.updated_at = datetime.now()
+        self._conn.execute(
+            "UPDATE projects SET updated_at = ? WHERE id = ?",
+            (project.updated_at.isoformat(), project.id),
+        )
+
+    def _load_project(self, project_id: str) -> Optional[Project]:
+        """Carrega um projeto e seus PDFs do banco"""
+        row = self._conn.execute(
+            "SELECT * FROM projects WHERE id = ?", (project_id,)
+        ).fetchone()
+        if not row:
+            return None
+
+        pdf_rows = self._conn.execute(
+            "SELECT * FROM pdfs WHERE project_id = ? ORDER BY rowid", (project_id,)
+        ).fetchall()
+        pdfs = [
+            PDFDocument(
+                id=r["id"],
+                filename=r["filename"],
+                file_path=r["file_path"],
+                status=PDFStatus(r["status"]),
+                extracted_text_path=r["extracted_text_path"],
+                page_count=r["page_count"],
+                word_count=r["word_count"],
+                upload_date=datetime.fromisoformat(r["upload_date"]),
+                error_message=r["error_message"],
+            )
+            for r in pdf_rows
+        ]
+
+        return Project(
+            id=row["id"],
+            name=row["name"],
+            description=row["description"],
+            pdfs=pdfs,
+            created_at=datetime.fromisoformat(row["created_at"]),
+            updated_at=datetime.fromisoformat(row["updated_at"]),
+            is_active=bool(row["is_active"]),
+        )
+
+    def _cache_put(self, project: Project):
+        self._cache[project.id] = project
+        self._cache.move_to_end(project.id)
+        while len(self._cache) > PROJECT_CACHE_SIZE:
+            self._cache.popitem(last=False)
 
     # ============================================
     # CRUD de Projetos
@@ -91,66 +244,95 @@ class ProjectService:
             name=request.name,
             description=request.description,
         )
-        self._projects[project.id] = project
-        self._save_projects()
+        with self._conn:
+            self._insert_project(project)
+        self._cache_put(project)
         logger.info(f"Projeto criado: {project.id} - {project.name}")
         return project
 
     def get_project(self, project_id: str) -> Optional[Project]:
         """Obtém um projeto pelo ID"""
-        return self._projects.get(project_id)
+        project = self._cache.get(project_id)
+        if project is not None:
+            self._cache.move_to_end(project_id)
+            return project
+
+        project = self._load_project(project_id)
+        if project is not None:
+            self._cache_put(project)
+        return project
 
     def list_projects(self, include_inactive: bool = False) -> List[ProjectSummary]:
         """Lista todos os projetos como resumos"""
-        summaries = []
-        for project in self._projects.values():
-            if not include_inactive and not project.is_active:
-                continue
-            summaries.append(ProjectSummary(
-                id=project.id,
-                name=project.name,
-                description=project.description,
-                pdf_count=len(project.pdfs),
-                total_words=sum(pdf.word_count for pdf in project.pdfs if pdf.status == PDFStatus.READY),
-                created_at=project.created_at,
-                is_active=project.is_active,
-            ))
-        return sorted(summaries, key=lambda x: x.created_at, reverse=True)
+        query = """
+            SELECT p.id, p.name, p.description, p.created_at, p.is_active,
+                   COUNT(d.id) AS pdf_count,
+                   COALESCE(SUM(CASE WHEN d.status = ? THEN d.word_count ELSE 0 END), 0) AS total_words
+            FROM projects p
+            LEFT JOIN pdfs d ON d.project_id = p.id
+        """
+        params: list = [PDFStatus.READY.value]
+        if not include_inactive:
+            query += " WHERE p.is_active = 1"
+        query += " GROUP BY p.id ORDER BY p.created_at DESC"
+
+        return [
+            ProjectSummary(
+                id=row["id"],
+                name=row["name"],
+                description=row["description"],
+                pdf_count=row["pdf_count"],
+                total_words=row["total_words"],
+                created_at=datetime.fromisoformat(row["created_at"]),
+                is_active=bool(row["is_active"]),
+            )
+            for row in self._conn.execute(query, params)
+        ]
 
     def update_project(self, project_id: str, request: UpdateProjectRequest) -> Optional[Project]:
         """Atualiza um projeto"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return None
 
+        # Apenas as colunas alteradas entram no UPDATE
+        changes = {}
         if request.name is not None:
             project.name = request.name
+            changes["name"] = project.name
         if request.description is not None:
             project.description = request.description
+            changes["description"] = project.description
         if request.is_active is not None:
             project.is_active = request.is_active
+            changes["is_active"] = int(project.is_active)
 
         project.updated_at = datetime.now()
-        self._save_projects()
+        changes["updated_at"] = project.updated_at.isoformat()
+
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        with self._conn:
+            self._conn.execute(
+                f"UPDATE projects SET {assignments} WHERE id = ?",
+                (*changes.values(), project_id),
+            )
         logger.info(f"Projeto atualizado: {project_id}")
         return project
 
     def delete_project(self, project_id: str) -> bool:
         """Deleta um projeto e seus PDFs"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return False
 
         # Deletar arquivos PDF associados
         for pdf in project.pdfs:
-            try:
-                if os.path.exists(pdf.file_path):
-                    os.remove(pdf.file_path)
-            except Exception as e:
-                logger.warning(f"Erro ao deletar PDF {pdf.id}: {e}")
+            self._remove_pdf_files(pdf)
 
-        del self._projects[project_id]
-        self._save_projects()
+        with self._conn:
+            self._conn.execute("DELETE FROM pdfs WHERE project_id = ?", (project_id,))
+            self._conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        self._cache.pop(project_id, None)
         logger.info(f"Projeto deletado: {project_id}")
         return True
 
@@ -165,7 +347,7 @@ class ProjectService:
         file_content: bytes,
     ) -> Optional[PDFDocument]:
         """Adiciona um PDF a um projeto"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return None
 
@@ -182,8 +364,7 @@ class ProjectService:
         file_path = os.path.join(project_pdf_dir, f"{pdf_doc.id}_{filename}")
 
         try:
-            with open(file_path, "wb") as f:
-                f.write(file_content)
+            _write_bytes(file_path, file_content)
             pdf_doc.file_path = file_path
         except Exception as e:
             logger.error(f"Erro ao salvar PDF: {e}")
@@ -194,10 +375,11 @@ class ProjectService:
         # Processar PDF (extrair texto)
         try:
             pdf_doc.status = PDFStatus.PROCESSING
-            text, pages, words = pdf_service.extract_text_limited(file_path)
-            pdf_doc.extracted_text = text
-            pdf_doc.page_count = pages
-            pdf_doc.word_count = words
+            processed = pdf_service.process(file_path)
+            pdf_doc.extracted_text = processed["text"]
+            pdf_doc.page_count = processed["page_count"]
+            pdf_doc.word_count = processed["word_count"]
+            self._write_text_sidecar(project_id, pdf_doc)
             pdf_doc.status = PDFStatus.READY
         except Exception as e:
             logger.error(f"Erro ao processar PDF: {e}")
@@ -205,16 +387,17 @@ class ProjectService:
             pdf_doc.error_message = str(e)
 
         # Adicionar ao projeto
+        with self._conn:
+            self._insert_pdf(project_id, pdf_doc)
+            self._touch_project(project)
         project.pdfs.append(pdf_doc)
-        project.updated_at = datetime.now()
-        self._save_projects()
 
         logger.info(f"PDF adicionado ao projeto {project_id}: {filename}")
         return pdf_doc
 
     def get_pdf(self, project_id: str, pdf_id: str) -> Optional[PDFDocument]:
         """Obtém um PDF específico de um projeto"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return None
 
@@ -225,23 +408,20 @@ class ProjectService:
 
     def remove_pdf_from_project(self, project_id: str, pdf_id: str) -> bool:
         """Remove um PDF de um projeto"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return False
 
         for i, pdf in enumerate(project.pdfs):
             if pdf.id == pdf_id:
-                # Deletar arquivo
-                try:
-                    if os.path.exists(pdf.file_path):
-                        os.remove(pdf.file_path)
-                except Exception as e:
-                    logger.warning(f"Erro ao deletar arquivo PDF: {e}")
+                # Deletar arquivos
+                self._remove_pdf_files(pdf)
 
                 # Remover da lista
+                with self._conn:
+                    self._conn.execute("DELETE FROM pdfs WHERE id = ?", (pdf_id,))
+                    self._touch_project(project)
                 project.pdfs.pop(i)
-                project.updated_at = datetime.now()
-                self._save_projects()
                 logger.info(f"PDF removido: {pdf_id} do projeto {project_id}")
                 return True
 
@@ -253,7 +433,7 @@ class ProjectService:
 
     def get_project_context(self, project_id: str, max_chars: int = 10000) -> Optional[str]:
         """Obtém o contexto combinado de todos os PDFs de um projeto"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return None
 
@@ -261,7 +441,7 @@ class ProjectService:
 
     def get_project_context_info(self, project_id: str) -> Optional[dict]:
         """Obtém informações sobre o contexto de um projeto"""
-        project = self._projects.get(project_id)
+        project = self.get_project(project_id)
         if not project:
             return None
 
@@ -6,7 +6,11 @@ Usa embeddings do Gemini para buscar trechos relevantes de documentos longos.
 import google.generativeai as genai
 import numpy as np
 import os
-from typing import List, Dict, Any
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
 
 import hashlib
 
@@ -15,18 +19,140 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Quantidade máxima de embeddings de query mantidos em cache
+QUERY_CACHE_SIZE = 256
+
+# Fronteiras de frase (após . ! ?) e de parágrafo (linha em branco)
+_SENT_RE = re.compile(r'(?<=[.!?])\s+|\n\n+')
+
+# Lotes de embedding enviados em paralelo para a API
+EMBED_MAX_WORKERS = 5
+
+# Índices persistidos em disco, um arquivo .npz por conteúdo
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAG_CACHE_DIR = os.path.join(BASE_DIR, "data", "rag_cache")
+
+# Versão do formato dos índices em disco (quantização, campos do .npz);
+# incrementar ao mudá-lo para que índices antigos não sejam reaproveitados
+RAG_INDEX_VERSION = 1
+
+# Limites do cache em disco; os índices usados há mais tempo (mtime) saem primeiro
+RAG_CACHE_MAX_FILES = int(os.getenv("RAG_CACHE_MAX_FILES", "200"))
+RAG_CACHE_MAX_BYTES = int(os.getenv("RAG_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+def _prune_cache() -> int:
+    """
+    Remove os índices menos usados até respeitar RAG_CACHE_MAX_FILES e RAG_CACHE_MAX_BYTES.
+    O mtime de cada arquivo é atualizado a cada leitura, então vale como último uso.
+
+    Returns:
+        int: Quantidade de arquivos removidos
+    """
+    try:
+        entries = []
+        with os.scandir(RAG_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".npz"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    # Mais recentes primeiro: mantém enquanto couber nos limites
+    entries.sort(reverse=True)
+    kept_files = 0
+    kept_bytes = 0
+    removed = 0
+    for _, size, path in entries:
+        if kept_files < RAG_CACHE_MAX_FILES and kept_bytes + size <= RAG_CACHE_MAX_BYTES:
+            kept_files += 1
+            kept_bytes += size
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normaliza vetores (linhas) para norma 1, de modo que o produto escalar seja o cosseno"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray) -> tuple:
+    """
+    Quantiza vetores float32 para int8 com uma escala por vetor.
+    Retorna (valores int8, escalas float32) tal que vetor ~= valores * escala.
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _split_chunks(text: str, chunk_size: int) -> List[str]:
+    """
+    Divide o texto em chunks de até chunk_size caracteres, cortando em fronteiras
+    de frase/parágrafo e sem sobreposição. Frases maiores que chunk_size são
+    cortadas no limite.
+    """
+    chunks = []
+    start = 0
+    last_break = 0
+    boundaries = [m.end() for m in _SENT_RE.finditer(text)]
+    boundaries.append(len(text))
+
+    for end in boundaries:
+        if end - start > chunk_size:
+            if last_break > start:
+                chunks.append(text[start:last_break])
+                start = last_break
+            while end - start > chunk_size:
+                chunks.append(text[start:start + chunk_size])
+                start += chunk_size
+        last_break = end
+
+    if start < len(text):
+        chunks.append(text[start:])
+
+    return [c.strip() for c in chunks if c.strip()]
+
 
 class SimpleRAG:
     def __init__(self):
-        self.chunks: List[Dict[str, Any]] = []
+        self.texts: List[str] = []
+        # Matriz (N x D) de embeddings normalizados quantizados em int8,
+        # uma linha por chunk, com a escala de cada linha em embedding_scales
+        self.embeddings_i8: Optional[np.ndarray] = None
+        self.embedding_scales: Optional[np.ndarray] = None
         self.model_name = "models/text-embedding-004" # Ou embedding-001
+        # Chamadas de embedding com argumentos fixos pré-montados
+        self._embed_documents = partial(
+            genai.embed_content,
+            model=self.model_name,
+            task_type="retrieval_document",
+            title="Academic Document Segment"  # Title é opcional, mas ajuda na qualidade
+        )
+        self._embed_query_batch = partial(
+            genai.embed_content,
+            model=self.model_name,
+            task_type="retrieval_query"
+        )
         self.last_hash = ""
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
 
     def clear(self):
-        self.chunks = []
+        self.texts = []
+        self.embeddings_i8 = None
+        self.embedding_scales = None
         self.last_hash = ""
 
-    def chunk_document(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> int:
+    def chunk_document(self, text: str, chunk_size: int = 1000) -> int:
         """
         Divide o documento em chunks e gera embeddings.
         Retorna o número de chunks gerados. Uses caching based on content hash.
@@ -36,101 +162,164 @@ class SimpleRAG:
 
         # Calcular hash do conteúdo para cache
         content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
-        
+
         # Se o conteúdo não mudou, usar cache
-        if self.last_hash == content_hash and self.chunks:
+        if self.last_hash == content_hash and self.texts:
             # print(f"[RAG] Usando cache para hash {content_hash[:8]}")
-            return len(self.chunks)
-            
+            return len(self.texts)
+
         self.clear()
+
+        # Índice já persistido em disco (evita chamar a API de embeddings)
+        # Chave inclui modelo de embedding e versão do formato: índices gerados
+        # com outro modelo ou quantização não são carregados
+        model_key = re.sub(r'[^\w.-]', '-', self.model_name)
+        cache_path = os.path.join(
+            RAG_CACHE_DIR,
+            f"{content_hash}_{chunk_size}_{model_key}_v{RAG_INDEX_VERSION}.npz"
+        )
+        if self._load_index(cache_path):
+            self.last_hash = content_hash
+            print(f"[RAG] Índice carregado do disco: {len(self.texts)} chunks.")
+            return len(self.texts)
+
         self.last_hash = content_hash
-        
-        # Dividir em chunks
-        start = 0
-        text_len = len(text)
-        
-        chunks_text = []
-        while start < text_len:
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks_text.append(chunk)
-            start += chunk_size - overlap
-            
+
+        # Dividir em chunks nas fronteiras de frase/parágrafo
+        chunks_text = _split_chunks(text, chunk_size)
+
         if not chunks_text:
             return 0
 
         # Gerar embeddings em lote (limite de 100 por vez para evitar erros)
         batch_size = 20
         all_embeddings = []
-        
+
         try:
-            for i in range(0, len(chunks_text), batch_size):
-                batch = chunks_text[i:i+batch_size]
-                # Title é opcional, mas ajuda na qualidade
-                result = genai.embed_content(
-                    model=self.model_name,
-                    content=batch,
-                    task_type="retrieval_document",
-                    title="Academic Document Segment"
-                )
-                all_embeddings.extend(result['embedding'])
-                
-            # Armazenar
-            for i, text_chunk in enumerate(chunks_text):
-                self.chunks.append({
-                    "id": i,
-                    "text": text_chunk,
-                    "embedding": all_embeddings[i]
-                })
-                
-            print(f"[RAG] Indexados {len(self.chunks)} chunks.")
-            return len(self.chunks)
-            
+            # Lotes independentes: disparados em paralelo, resultados lidos em ordem
+            with ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS) as executor:
+                futures = [
+                    executor.submit(self._embed_documents, content=chunks_text[i:i+batch_size])
+                    for i in range(0, len(chunks_text), batch_size)
+                ]
+                for future in futures:
+                    all_embeddings.extend(future.result()['embedding'])
+
+            # Armazenar como matriz contígua normalizada e quantizada (int8 = 1/4 da memória)
+            self.texts = chunks_text
+            self.embeddings_i8, self.embedding_scales = _quantize(
+                _normalize(np.asarray(all_embeddings, dtype=np.float32))
+            )
+            self._save_index(cache_path)
+
+            print(f"[RAG] Indexados {len(self.texts)} chunks.")
+            return len(self.texts)
+
         except Exception as e:
             print(f"[RAG] Erro ao gerar embeddings: {e}")
             return 0
 
+    def _load_index(self, path: str) -> bool:
+        """Carrega um índice salvo por _save_index. Retorna False se não existir ou falhar."""
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                self.texts = data["texts"].tolist()
+                self.embeddings_i8 = data["embeddings_i8"]
+                self.embedding_scales = data["embedding_scales"]
+        except Exception as e:
+            print(f"[RAG] Erro ao carregar índice {path}: {e}")
+            self.clear()
+            return False
+
+        # Marca o uso (mtime) para a remoção por LRU em _prune_cache
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True
+
+    def _save_index(self, path: str):
+        """Persiste textos e embeddings quantizados em um .npz comprimido"""
+        try:
+            os.makedirs(RAG_CACHE_DIR, exist_ok=True)
+            np.savez_compressed(
+                path,
+                texts=np.array(self.texts, dtype=str),
+                embeddings_i8=self.embeddings_i8,
+                embedding_scales=self.embedding_scales,
+            )
+            removed = _prune_cache()
+            if removed:
+                print(f"[RAG] {removed} índices antigos removidos do cache em disco")
+        except Exception as e:
+            print(f"[RAG] Erro ao salvar índice {path}: {e}")
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Retorna a matriz (B x D) de embeddings normalizados das queries.
+        Queries já vistas vêm do cache; as demais são geradas em uma única chamada.
+        """
+        keys = [hashlib.md5(q.encode('utf-8')).hexdigest() for q in queries]
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key in self._query_cache:
+                self._query_cache.move_to_end(key)
+            else:
+                missing[key] = query
+
+        if missing:
+            result = self._embed_query_batch(content=list(missing.values()))
+            vectors = _normalize(np.asarray(result['embedding'], dtype=np.float32))
+            for key, vec in zip(missing.keys(), vectors):
+                self._query_cache[key] = vec
+                self._query_cache.move_to_end(key)
+
+        matrix = np.stack([self._query_cache[key] for key in keys])
+
+        while len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+
+        return matrix
+
+    def _top_texts(self, scores: np.ndarray, top_k: int) -> List[str]:
+        """Seleciona os textos com maior score, em ordem decrescente"""
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [self.texts[i] for i in idx]
+
     def retrieve(self, query: str, top_k: int = 3) -> List[str]:
         """
         Busca os chunks mais relevantes para a query.
         """
-        if not self.chunks:
-            return []
+        results = self.retrieve_batch([query], top_k=top_k)
+        return results[0] if results else []
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 3) -> List[List[str]]:
+        """
+        Busca os chunks mais relevantes para várias queries de uma vez.
+        Gera os embeddings das queries em uma única chamada e calcula
+        todas as similaridades com um único produto de matrizes.
+        """
+        if self.embeddings_i8 is None or not queries:
+            return [[] for _ in queries]
 
         try:
-            # Gerar embedding da query
-            query_embedding = genai.embed_content(
-                model=self.model_name,
-                content=query,
-                task_type="retrieval_query"
-            )['embedding']
-            
-            # Calcular similaridade (produto escalar)
-            # Assumindo vetores normalizados (Gemini geralmente retorna normalizados?)
-            # Se não, precisaria de cosine_similarity completo.
-            # Para simplificar, produto escalar é suficiente para ranking.
-            
-            scores = []
-            q_vec = np.array(query_embedding)
-            
-            for chunk in self.chunks:
-                c_vec = np.array(chunk['embedding'])
-                # Cosine similarity: (A . B) / (||A|| * ||B||)
-                dot_product = np.dot(q_vec, c_vec)
-                norm_q = np.linalg.norm(q_vec)
-                norm_c = np.linalg.norm(c_vec)
-                similarity = dot_product / (norm_q * norm_c)
-                scores.append((similarity, chunk['text']))
-                
-            # Ordenar por similaridade decrescente
-            scores.sort(key=lambda x: x[0], reverse=True)
-            
-            # Retornar top_k textos
-            return [item[1] for item in scores[:top_k]]
-            
+            q_matrix = self._embed_queries(queries)
+
+            # Similaridade de cosseno (vetores já normalizados): N x B.
+            # A matriz int8 é promovida a float32 no produto e reescalada por linha.
+            scores = (self.embeddings_i8 @ q_matrix.T) * self.embedding_scales[:, None]
+
+            return [self._top_texts(scores[:, j], top_k) for j in range(len(queries))]
+
         except Exception as e:
             print(f"[RAG] Erro na busca: {e}")
-            return []
+            return [[] for _ in queries]
 
 # Instância global para uso simples
 rag_service = SimpleRAG()
@@ -4,30 +4,31 @@ Remove ou neutraliza tentativas de injetar instruções maliciosas nos prompts d
 """
 
 import re
+from functools import lru_cache
 
 # Padrões que indicam tentativa de prompt injection
 INJECTION_PATTERNS = [
     # Tentativas de override de instrução
-    r"(?i)ignore\s+(all\s+)?(previous|above|prior)\s+(instructions?|prompts?|rules?)",
-    r"(?i)disregard\s+(all\s+)?(previous|above|prior)",
-    r"(?i)forget\s+(everything|all|your)\s+(instructions?|rules?|prompts?)",
-    r"(?i)new\s+instructions?:\s*",
-    r"(?i)system\s*prompt\s*:",
-    r"(?i)you\s+are\s+now\s+a\s+",
-    r"(?i)act\s+as\s+if\s+you\s+(were|are)\s+",
-    r"(?i)pretend\s+(to\s+be|you\s+are)\s+",
+    r"ignore\s+(all\s+)?(previous|above|prior)\s+(instructions?|prompts?|rules?)",
+    r"disregard\s+(all\s+)?(previous|above|prior)",
+    r"forget\s+(everything|all|your)\s+(instructions?|rules?|prompts?)",
+    r"new\s+instructions?:\s*",
+    r"system\s*prompt\s*:",
+    r"you\s+are\s+now\s+a\s+",
+    r"act\s+as\s+if\s+you\s+(were|are)\s+",
+    r"pretend\s+(to\s+be|you\s+are)\s+",
     # Tentativas de extrair system prompt
-    r"(?i)repeat\s+(the\s+)?(system\s+)?prompt",
-    r"(?i)show\s+(me\s+)?(your\s+)?(system\s+)?prompt",
-    r"(?i)what\s+(are|is)\s+your\s+(instructions?|rules?|prompt)",
-    r"(?i)print\s+(your\s+)?(system\s+)?prompt",
+    r"repeat\s+(the\s+)?(system\s+)?prompt",
+    r"show\s+(me\s+)?(your\s+)?(system\s+)?prompt",
+    r"what\s+(are|is)\s+your\s+(instructions?|rules?|prompt)",
+    r"print\s+(your\s+)?(system\s+)?prompt",
     # Tentativas de executar código
-    r"(?i)execute\s+(this\s+)?(code|command|script)",
-    r"(?i)run\s+(this\s+)?(code|command|script)",
-    r"(?i)<script[\s>]",
-    r"(?i)eval\s*\(",
-    r"(?i)import\s+os",
-    r"(?i)subprocess\.",
+    r"execute\s+(this\s+)?(code|command|script)",
+    r"run\s+(this\s+)?(code|command|script)",
+    r"<script[\s>]",
+    r"eval\s*\(",
+    r"import\s+os",
+    r"subprocess\.",
 ]
 
 # Marcadores de separação que podem confundir o modelo
@@ -44,6 +45,17 @@ SEPARATOR_PATTERNS = [
 ]
 
 
+def _union(patterns: list) -> re.Pattern:
+    """Funde os padrões em uma única alternância (uma só varredura do texto)"""
+    return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+
+
+# Padrões fundidos e pré-compilados uma única vez na importação do módulo
+_INJECTION_UNION = _union(INJECTION_PATTERNS)
+_SEPARATOR_UNION = _union(SEPARATOR_PATTERNS)
+_ALL_UNION = _union(INJECTION_PATTERNS + SEPARATOR_PATTERNS)
+
+
 def sanitize_user_input(text: str, max_length: int = 50000) -> str:
     """
     Sanitiza input do usuário para uso seguro em prompts de IA.
@@ -57,17 +69,21 @@ def sanitize_user_input(text: str, max_length: int = 50000) -> str:
         return ""
 
     # 1. Truncar
-    text = text[:max_length]
+    return _sanitize_truncated(text[:max_length])
+
 
+@lru_cache(maxsize=256)
+def _sanitize_truncated(text: str) -> str:
+    """
+    Aplica os filtros em um texto já truncado.
+    Cacheado para que seleções repetidas (retentativas, revisões) não
+    sejam varridas novamente.
+    """
     # 2. Remover marcadores de separação que confundem o modelo
-    for pattern in SEPARATOR_PATTERNS:
-        text = re.sub(pattern, "[removido]", text, flags=re.IGNORECASE)
+    text = _SEPARATOR_UNION.sub("[removido]", text)
 
-    # 3. Detectar e neutralizar injection patterns
-    for pattern in INJECTION_PATTERNS:
-        if re.search(pattern, text):
-            # Não remove o texto, mas adiciona aspas para tratar como dado
-            text = re.sub(pattern, "[input-filtrado]", text, flags=re.IGNORECASE)
+    # 3. Neutralizar injection patterns (não remove o texto, marca como filtrado)
+    text = _INJECTION_UNION.sub("[input-filtrado]", text)
 
     return text.strip()
 
@@ -86,11 +102,4 @@ def is_suspicious_input(text: str) -> bool:
     Verifica se o input contém padrões suspeitos de prompt injection.
     Retorna True se detectar tentativa.
     """
-    if not text:
-        return False
-
-    for pattern in INJECTION_PATTERNS + SEPARATOR_PATTERNS:
-        if re.search(pattern, text, flags=re.IGNORECASE):
-            return True
-
-    return False
+    return bool(text) and _ALL_UNION.search(text) is not None
@@ -4,9 +4,169 @@ Sistema de validação visual comparando PDFs antes/depois
 """
 
 import fitz  # PyMuPDF
+import numpy as np
 import os
-from typing import Dict, Any, List
-import statistics
+from collections import Counter
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from services._validator_kernels import margin_stats, spacing_ratios, line_margin_stds, warmup as warmup_kernels
+
+# Extração de texto sem blocos de imagem (validadores só usam texto)
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Trechos de nome de fonte aceitos (ArialMT, Times-Roman, TimesNewRomanPSMT...)
+ACCEPTED_FONT_NAMES = ("Arial", "Times")
+
+# Conversão de pontos para cm (72 points = 1 inch = 2.54 cm)
+PT_TO_CM = 2.54 / 72.0
+
+# Ordem das margens nos arrays do validador
+MARGIN_SIDES = ("left", "top", "right", "bottom")
+
+# Amostragem de fontes: a contagem para quando a fonte e o tamanho mais usados
+# já superam o segundo colocado nessa proporção, após um mínimo de spans
+FONT_SAMPLE_MIN_SPANS = 500
+FONT_SAMPLE_CHECK_EVERY = 200
+FONT_DOMINANCE_RATIO = 3
+
+
+def _is_dominant(counter: Counter) -> bool:
+    """Verifica se o item mais frequente supera o segundo em FONT_DOMINANCE_RATIO vezes"""
+    top = counter.most_common(2)
+    return len(top) < 2 or top[0][1] > FONT_DOMINANCE_RATIO * top[1][1]
+
+
+def _empty_bboxes() -> np.ndarray:
+    """Array (0 x 4) float32 usado como bbox vazio"""
+    return np.empty((0, 4), dtype=np.float32)
+
+
+@dataclass
+class PageFeatures:
+    """
+    Dados extraídos do PDF e compartilhados pelos validadores.
+    Bboxes em arrays contíguos (x0, y0, x1, y1), uma linha por bloco/linha.
+    """
+    page_count: int = 0
+    page_width: float = 0.0
+    page_height: float = 0.0
+    block_bboxes: np.ndarray = field(default_factory=_empty_bboxes)
+    line_bboxes: np.ndarray = field(default_factory=_empty_bboxes)
+    line_block_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    fonts: Counter = field(default_factory=Counter)
+    sizes: Counter = field(default_factory=Counter)  # Chave: tamanho em décimos de pt
+
+
+def _open_pdf(source: Union[str, bytes], label: str = "PDF") -> fitz.Document:
+    """
+    Abre um PDF a partir do caminho ou dos bytes já em memória.
+    filetype="pdf" evita a detecção do tipo de arquivo.
+
+    Args:
+        source: Caminho do arquivo ou conteúdo do PDF
+        label: Nome usado na mensagem de erro
+
+    Returns:
+        fitz.Document: Documento aberto
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"{label} não encontrado: {source}")
+    return fitz.open(source, filetype="pdf")
+
+
+def _collect(pdf: fitz.Document, max_pages: int = 3) -> PageFeatures:
+    """
+    Extrai de uma só vez os dados usados pelos validadores.
+    Chama get_text("dict") uma única vez por página analisada.
+
+    Args:
+        pdf: Documento PDF
+        max_pages: Número máximo de páginas analisadas
+
+    Returns:
+        PageFeatures: bboxes de blocos e linhas da primeira página e as
+        contagens fonts/sizes dos spans das primeiras páginas (amostradas:
+        param quando a fonte e o tamanho principais se estabilizam)
+    """
+    features = PageFeatures(page_count=len(pdf))
+    if len(pdf) == 0:
+        return features
+
+    # "dict" é a única extração feita: "blocks" (tuplas) não traz linhas nem
+    # fontes, e uma segunda chamada por página custaria mais do que economiza.
+    # "rawdict" não é usado porque desce até o nível de caractere.
+    fonts = features.fonts
+    sizes = features.sizes
+    total_spans = 0
+    next_check = FONT_SAMPLE_CHECK_EVERY
+    sampling = True
+
+    for page_num in range(min(max_pages, len(pdf))):
+        page = pdf[page_num]
+        page_dict = page.get_text("dict", flags=TEXT_FLAGS, sort=False)
+        # Apenas blocos de texto (type 0); TEXT_FLAGS já omite as imagens
+        blocks = [b for b in page_dict["blocks"] if b["type"] == 0]
+
+        if page_num == 0:
+            rect = page.rect
+            features.page_width = rect.width
+            features.page_height = rect.height
+            lines = [(i, line["bbox"]) for i, block in enumerate(blocks) for line in block["lines"]]
+            features.block_bboxes = np.array(
+                [block["bbox"] for block in blocks], dtype=np.float32
+            ).reshape(-1, 4)
+            features.line_bboxes = np.array(
+                [bbox for _, bbox in lines], dtype=np.float32
+            ).reshape(-1, 4)
+            features.line_block_ids = np.array([i for i, _ in lines], dtype=np.int32)
+
+        for block in blocks:
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    fonts[span["font"]] += 1
+                    sizes[int(span["size"] * 10 + 0.5)] += 1
+                total_spans += len(line["spans"])
+                if total_spans >= next_check:
+                    next_check = total_spans + FONT_SAMPLE_CHECK_EVERY
+                    if (total_spans > FONT_SAMPLE_MIN_SPANS
+                            and _is_dominant(fonts) and _is_dominant(sizes)):
+                        sampling = False
+                        break
+            if not sampling:
+                break
+
+        # Moda já estável: as páginas seguintes não mudariam o resultado
+        if not sampling:
+            break
+
+    return features
+
+
+def _open_and_collect(
+    source: Union[str, bytes],
+    label: str = "PDF",
+    collect: bool = True
+) -> Tuple[int, Optional[PageFeatures]]:
+    """
+    Abre o PDF, extrai os dados dos validadores e fecha o documento.
+
+    Args:
+        source: Caminho do arquivo ou conteúdo do PDF
+        label: Nome usado na mensagem de erro
+        collect: Se False, apenas conta as páginas
+
+    Returns:
+        Tuple contendo número de páginas e PageFeatures (ou None)
+    """
+    pdf = _open_pdf(source, label)
+    try:
+        return len(pdf), (_collect(pdf) if collect else None)
+    finally:
+        pdf.close()
 
 
 class DocumentValidator:
@@ -14,37 +174,38 @@ class DocumentValidator:
     Validador de formatação usando análise visual de PDF
     """
 
-    def __init__(self):
-        """Inicializa o validador"""
-        self.tolerance_cm = 0.3  # Tolerância de 0.3cm para margens
-        self.tolerance_pt = 2.0  # Tolerância de 2pt para tamanhos
+    TOLERANCE_CM = 0.3  # Tolerância de 0.3cm para margens
+    TOLERANCE_PT = 2.0  # Tolerância de 2pt para tamanhos
+
+    # ABNT: 3cm topo/esq, 2cm baixo/dir (na ordem de MARGIN_SIDES)
+    EXPECTED_MARGINS = np.array([3.0, 3.0, 2.0, 2.0])
+    EXPECTED_MARGINS_DICT = MappingProxyType(dict(zip(MARGIN_SIDES, EXPECTED_MARGINS.tolist())))
 
-    def validate_formatting(self, original_pdf: str, formatted_pdf: str) -> Dict[str, Any]:
+    def validate_formatting(
+        self,
+        original_pdf: Union[str, bytes],
+        formatted_pdf: Union[str, bytes]
+    ) -> Dict[str, Any]:
         """
         Compara dois PDFs e valida mudanças de formatação
 
         Args:
-            original_pdf: Caminho do PDF original
-            formatted_pdf: Caminho do PDF formatado
+            original_pdf: Caminho (ou bytes) do PDF original
+            formatted_pdf: Caminho (ou bytes) do PDF formatado
 
         Returns:
             dict: Resultado da validação completa
         """
-        if not os.path.exists(original_pdf):
-            raise FileNotFoundError(f"PDF original não encontrado: {original_pdf}")
-
-        if not os.path.exists(formatted_pdf):
-            raise FileNotFoundError(f"PDF formatado não encontrado: {formatted_pdf}")
-
-        original = fitz.open(original_pdf)
-        formatted = fitz.open(formatted_pdf)
+        # Do original só importa a contagem de páginas
+        original_pages, _ = _open_and_collect(original_pdf, "PDF original", collect=False)
+        formatted_pages, features = _open_and_collect(formatted_pdf, "PDF formatado")
 
         validation_result = {
-            "margins": self.validate_margins(formatted),
-            "fonts": self.validate_fonts(formatted),
-            "spacing": self.validate_spacing(formatted),
-            "alignment": self.validate_alignment(formatted),
-            "comparison": self.compare_documents(original, formatted),
+            "margins": self.validate_margins(features),
+            "fonts": self.validate_fonts(features),
+            "spacing": self.validate_spacing(features),
+            "alignment": self.validate_alignment(features),
+            "comparison": self.compare_documents(original_pages, formatted_pages),
             "overall_score": 0
         }
 
@@ -73,84 +234,46 @@ class DocumentValidator:
         validation_result["overall_score"] = round(sum(scores) / len(scores), 1)
         validation_result["overall_valid"] = validation_result["overall_score"] >= 90
 
-        original.close()
-        formatted.close()
-
         return validation_result
 
-    def validate_margins(self, pdf: fitz.Document) -> Dict[str, Any]:
+    def validate_margins(self, features: PageFeatures) -> Dict[str, Any]:
         """
         Valida se margens estão corretas (3cm topo/esq, 2cm baixo/dir)
 
         Args:
-            pdf: Documento PDF a validar
+            features: Dados extraídos do PDF por _collect
 
         Returns:
             dict: Resultado da validação de margens
         """
-        if len(pdf) == 0:
+        if features.page_count == 0:
             return {"valid": False, "reason": "Documento vazio", "score": 0}
 
-        page = pdf[0]
-        blocks = page.get_text("dict")["blocks"]
-
-        text_blocks = [b for b in blocks if "lines" in b]
-        if not text_blocks:
+        # Coordenadas dos blocos de texto (x0, y0, x1, y1)
+        bboxes = features.block_bboxes
+        if len(bboxes) == 0:
             return {"valid": False, "reason": "Nenhum texto encontrado", "score": 0}
 
-        # Pegar coordenadas dos blocos de texto
-        left_positions = []
-        top_positions = []
-        right_positions = []
-        bottom_positions = []
-
-        page_width = page.rect.width
-        page_height = page.rect.height
-
-        for block in text_blocks:
-            bbox = block["bbox"]
-            left_positions.append(bbox[0])
-            top_positions.append(bbox[1])
-            right_positions.append(bbox[2])
-            bottom_positions.append(bbox[3])
-
-        # Calcular margens em cm (72 points = 1 inch = 2.54 cm)
-        left_margin_cm = (min(left_positions) / 72) * 2.54 if left_positions else 0
-        top_margin_cm = (min(top_positions) / 72) * 2.54 if top_positions else 0
-        right_margin_cm = ((page_width - max(right_positions)) / 72) * 2.54 if right_positions else 0
-        bottom_margin_cm = ((page_height - max(bottom_positions)) / 72) * 2.54 if bottom_positions else 0
-
-        # ABNT: 3cm topo/esq, 2cm baixo/dir
-        expected = {
-            "left": 3.0,
-            "top": 3.0,
-            "right": 2.0,
-            "bottom": 2.0
-        }
+        page_width = features.page_width
+        page_height = features.page_height
 
-        measured = {
-            "left": round(left_margin_cm, 2),
-            "top": round(top_margin_cm, 2),
-            "right": round(right_margin_cm, 2),
-            "bottom": round(bottom_margin_cm, 2)
-        }
+        min_left, min_top, max_right, max_bottom = margin_stats(bboxes)
 
-        # Validar com tolerância
-        valid_left = abs(left_margin_cm - expected["left"]) <= self.tolerance_cm
-        valid_top = abs(top_margin_cm - expected["top"]) <= self.tolerance_cm
-        valid_right = abs(right_margin_cm - expected["right"]) <= self.tolerance_cm
-        valid_bottom = abs(bottom_margin_cm - expected["bottom"]) <= self.tolerance_cm
+        # Calcular margens em cm (esquerda, topo, direita, base)
+        margins_cm = np.array(
+            [min_left, min_top, page_width - max_right, page_height - max_bottom]
+        ) * PT_TO_CM
+        deviations = np.abs(margins_cm - self.EXPECTED_MARGINS)
+
+        expected = self.EXPECTED_MARGINS_DICT
+        measured = {side: round(cm, 2) for side, cm in zip(MARGIN_SIDES, margins_cm.tolist())}
 
+        # Validar com tolerância
+        valid_left, valid_top, valid_right, valid_bottom = (deviations <= self.TOLERANCE_CM).tolist()
         all_valid = valid_left and valid_top and valid_right and valid_bottom
 
         # Calcular score parcial
-        deviations = [
-            abs(left_margin_cm - expected["left"]),
-            abs(top_margin_cm - expected["top"]),
-            abs(right_margin_cm - expected["right"]),
-            abs(bottom_margin_cm - expected["bottom"])
-        ]
-        avg_deviation = sum(deviations) / len(deviations)
+        avg_deviation = float(deviations.mean())
         score = max(0, 100 - (avg_deviation * 30))  # Penalizar 30 pontos por cm de desvio
 
         issues = []
@@ -166,59 +289,43 @@ class DocumentValidator:
         return {
             "valid": all_valid,
             "measured": measured,
-            "expected": expected,
-            "tolerance_cm": self.tolerance_cm,
+            "expected": dict(expected),
+            "tolerance_cm": self.TOLERANCE_CM,
             "issues": issues,
             "score": round(score, 1)
         }
 
-    def validate_fonts(self, pdf: fitz.Document) -> Dict[str, Any]:
+    def validate_fonts(self, features: PageFeatures) -> Dict[str, Any]:
         """
         Valida se fontes estão corretas (Arial ou Times 12pt)
 
         Args:
-            pdf: Documento PDF a validar
+            features: Dados extraídos do PDF por _collect
 
         Returns:
             dict: Resultado da validação de fontes
         """
-        if len(pdf) == 0:
+        if features.page_count == 0:
             return {"valid": False, "reason": "Documento vazio", "score": 0}
 
-        fonts_found = {}
-        sizes_found = {}
-        total_spans = 0
-
-        # Analisar primeiras 3 páginas
-        for page_num in range(min(3, len(pdf))):
-            page = pdf[page_num]
-            blocks = page.get_text("dict")["blocks"]
-
-            for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            font = span["font"]
-                            size = round(span["size"], 1)
+        # Contagens dos spans das primeiras 3 páginas
+        fonts_found = features.fonts
+        sizes_found = features.sizes
 
-                            fonts_found[font] = fonts_found.get(font, 0) + 1
-                            sizes_found[size] = sizes_found.get(size, 0) + 1
-                            total_spans += 1
-
-        if total_spans == 0:
+        if not fonts_found:
             return {"valid": False, "reason": "Nenhum texto encontrado", "score": 0}
 
         # Fonte mais usada
-        main_font = max(fonts_found, key=fonts_found.get) if fonts_found else "Desconhecida"
-        main_size = max(sizes_found, key=sizes_found.get) if sizes_found else 0
+        main_font = fonts_found.most_common(1)[0][0]
+        main_size = sizes_found.most_common(1)[0][0] / 10.0
 
-        # Verificar se Arial ou Times está presente
-        has_arial = any("Arial" in font for font in fonts_found.keys())
-        has_times = any("Times" in font for font in fonts_found.keys())
-        has_correct_font = has_arial or has_times
+        # Verificar se Arial ou Times está presente: uma única busca por nome
+        # sobre os nomes distintos unidos (o separador impede falsos positivos)
+        font_names = "\n".join(fonts_found)
+        has_correct_font = any(name in font_names for name in ACCEPTED_FONT_NAMES)
 
         # Verificar tamanho 12pt
-        has_12pt = abs(main_size - 12.0) <= self.tolerance_pt
+        has_12pt = abs(main_size - 12.0) <= self.TOLERANCE_PT
 
         all_valid = has_correct_font and has_12pt
 
@@ -237,8 +344,8 @@ class DocumentValidator:
             "valid": all_valid,
             "main_font": main_font,
             "main_size": main_size,
-            "fonts_found": dict(sorted(fonts_found.items(), key=lambda x: x[1], reverse=True)[:5]),
-            "sizes_found": dict(sorted(sizes_found.items(), key=lambda x: x[1], reverse=True)[:5]),
+            "fonts_found": dict(fonts_found.most_common(5)),
+            "sizes_found": {key / 10.0: count for key, count in sizes_found.most_common(5)},
             "expected": {
                 "font": "Arial ou Times New Roman",
                 "size": 12.0
@@ -247,45 +354,27 @@ class DocumentValidator:
             "score": round(score, 1)
         }
 
-    def validate_spacing(self, pdf: fitz.Document) -> Dict[str, Any]:
+    def validate_spacing(self, features: PageFeatures) -> Dict[str, Any]:
         """
         Valida espaçamento entre linhas (deve ser ~1.5)
 
         Args:
-            pdf: Documento PDF a validar
+            features: Dados extraídos do PDF por _collect
 
         Returns:
             dict: Resultado da validação de espaçamento
         """
-        if len(pdf) == 0:
+        if features.page_count == 0:
             return {"valid": False, "reason": "Documento vazio", "score": 0}
 
-        line_spacings = []
-
-        # Analisar primeira página
-        page = pdf[0]
-        blocks = page.get_text("dict")["blocks"]
-
-        for block in blocks:
-            if "lines" in block:
-                lines = block["lines"]
-                for i in range(len(lines) - 1):
-                    y1 = lines[i]["bbox"][3]  # Bottom da primeira linha
-                    y2 = lines[i + 1]["bbox"][1]  # Top da segunda linha
+        # Analisar primeira página: pares de linhas consecutivas do mesmo bloco
+        line_spacings = spacing_ratios(features.line_bboxes, features.line_block_ids)
 
-                    # Altura da linha (aproximação)
-                    line_height = lines[i]["bbox"][3] - lines[i]["bbox"][1]
-
-                    if line_height > 0:
-                        # Calcular espaçamento relativo
-                        spacing_ratio = (y2 - y1) / line_height
-                        line_spacings.append(spacing_ratio)
-
-        if not line_spacings:
+        if line_spacings.size == 0:
             return {"valid": False, "reason": "Não foi possível medir espaçamento", "score": 0}
 
-        avg_spacing = statistics.mean(line_spacings)
-        median_spacing = statistics.median(line_spacings)
+        avg_spacing = float(line_spacings.mean())
+        median_spacing = float(np.median(line_spacings))
 
         # Espaçamento 1.5 = ~0.5 de gap entre linhas
         expected_ratio = 0.5
@@ -304,44 +393,30 @@ class DocumentValidator:
             "avg_spacing_ratio": round(avg_spacing, 3),
             "median_spacing_ratio": round(median_spacing, 3),
             "expected_ratio": expected_ratio,
-            "sample_size": len(line_spacings),
+            "sample_size": int(line_spacings.size),
             "issues": issues,
             "score": round(score, 1)
         }
 
-    def validate_alignment(self, pdf: fitz.Document) -> Dict[str, Any]:
+    def validate_alignment(self, features: PageFeatures) -> Dict[str, Any]:
         """
         Valida alinhamento justificado
 
         Args:
-            pdf: Documento PDF a validar
+            features: Dados extraídos do PDF por _collect
 
         Returns:
             dict: Resultado da validação de alinhamento
         """
-        if len(pdf) == 0:
+        if features.page_count == 0:
             return {"valid": False, "reason": "Documento vazio", "score": 0}
 
-        page = pdf[0]
-        page_width = page.rect.width
-        blocks = page.get_text("dict")["blocks"]
-
-        left_margins = []
-        right_margins = []
-
-        for block in blocks:
-            if "lines" in block:
-                for line in block["lines"]:
-                    bbox = line["bbox"]
-                    left_margins.append(bbox[0])
-                    right_margins.append(page_width - bbox[2])
-
-        if not left_margins:
+        lines = features.line_bboxes
+        if len(lines) == 0:
             return {"valid": False, "reason": "Nenhuma linha encontrada", "score": 0}
 
-        # Calcular desvio padrão das margens
-        left_std = statistics.stdev(left_margins) if len(left_margins) > 1 else 0
-        right_std = statistics.stdev(right_margins) if len(right_margins) > 1 else 0
+        # Calcular desvio padrão das margens (o da margem direita é o de x1)
+        left_std, right_std = line_margin_stds(lines)
 
         # Margens consistentes = texto justificado
         # Tolerância: desvio < 10pt
@@ -372,21 +447,21 @@ class DocumentValidator:
             "score": round(score, 1)
         }
 
-    def compare_documents(self, original: fitz.Document, formatted: fitz.Document) -> Dict[str, Any]:
+    def compare_documents(self, original_pages: int, formatted_pages: int) -> Dict[str, Any]:
         """
         Compara documentos original e formatado
 
         Args:
-            original: PDF original
-            formatted: PDF formatado
+            original_pages: Número de páginas do PDF original
+            formatted_pages: Número de páginas do PDF formatado
 
         Returns:
             dict: Comparação entre os documentos
         """
         return {
-            "original_pages": len(original),
-            "formatted_pages": len(formatted),
-            "pages_changed": len(original) != len(formatted),
+            "original_pages": original_pages,
+            "formatted_pages": formatted_pages,
+            "pages_changed": original_pages != formatted_pages,
             "comparison": "Documentos comparados com sucesso"
         }
 
@@ -403,30 +478,48 @@ class DocumentValidator:
         if not values or len(values) < 2:
             return 0.0
 
-        return statistics.stdev(values)
+        return float(np.std(values, ddof=1))
+
 
+# Validador compartilhado (sem estado por documento)
+_DEFAULT_VALIDATOR = DocumentValidator()
 
-def validate_document_quality(pdf_path: str) -> Dict[str, Any]:
+
+def validate_document_quality(pdf_or_path: Union[str, bytes, fitz.Document]) -> Dict[str, Any]:
     """
     Valida qualidade de um único documento
 
     Args:
-        pdf_path: Caminho para o PDF
+        pdf_or_path: Caminho para o PDF, seus bytes ou documento já aberto
+            (nesse caso não é reaberto nem fechado aqui)
 
     Returns:
         dict: Resultado da validação
     """
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF não encontrado: {pdf_path}")
+    if isinstance(pdf_or_path, fitz.Document):
+        features = _collect(pdf_or_path)
+    else:
+        _, features = _open_and_collect(pdf_or_path)
+    return _validate_features(features)
 
-    validator = DocumentValidator()
-    pdf = fitz.open(pdf_path)
+
+def _validate_features(features: PageFeatures) -> Dict[str, Any]:
+    """
+    Executa os validadores sobre os dados extraídos e monta o resultado
+
+    Args:
+        features: Dados extraídos do PDF por _collect
+
+    Returns:
+        dict: Resultado da validação
+    """
+    validator = _DEFAULT_VALIDATOR
 
     result = {
-        "margins": validator.validate_margins(pdf),
-        "fonts": validator.validate_fonts(pdf),
-        "spacing": validator.validate_spacing(pdf),
-        "alignment": validator.validate_alignment(pdf),
+        "margins": validator.validate_margins(features),
+        "fonts": validator.validate_fonts(features),
+        "spacing": validator.validate_spacing(features),
+        "alignment": validator.validate_alignment(features),
     }
 
     # Calcular score geral
@@ -464,6 +557,4 @@ def validate_document_quality(pdf_path: str) -> Dict[str, Any]:
     result["total_issues"] = len(all_issues)
     result["all_issues"] = all_issues
 
-    pdf.close()
-
     return result
@@ -1,7 +1,9 @@
 
 import asyncio
+import json
 import sys
 import os
+import time
 
 # Add backend directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -9,6 +11,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.addin_models import DocumentContent, ParagraphData, FormatType, PageSetup
 from routers.addin import analyze_content
 
+def emit_ndjson(test: str, started: float, result):
+    """Resultado do teste em uma linha JSON (NDJSON), para agregadores de benchmark"""
+    print(json.dumps({
+        "test": test,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "score": result.score,
+        "issues": len(result.issues),
+    }))
+
 async def run_test():
     print("=== TESTE DE VERIFICAÇÃO DE NORMAS ===")
 
@@ -60,14 +71,16 @@ async def run_test():
     doc_abnt = DocumentContent(
         paragraphs=paragraphs,
         format_type=FormatType.ABNT,
-        full_text="\n".join([p.text for p in paragraphs]),
+        full_text="\n".join(p.text for p in paragraphs),
         page_setup=page_setup
     )
+    started = time.perf_counter()
     result_abnt = await analyze_content(doc_abnt)
+    emit_ndjson("norms_abnt", started, result_abnt)
     print(f"Score ABNT: {result_abnt.score}")
     print(f"Issues ABNT: {len(result_abnt.issues)}")
-    for issue in result_abnt.issues:
-        print(f" - {issue.code}: {issue.message}")
+    if result_abnt.issues:
+        print("\n".join(f" - {issue.code}: {issue.message}" for issue in result_abnt.issues))
 
     # --- TESTE APA ---
     print("\n[2] Testando com APA (Espera-se BAIXA conformidade)...")
@@ -75,10 +88,12 @@ async def run_test():
     doc_apa = DocumentContent(
         paragraphs=paragraphs,
         format_type=FormatType.APA,
-        full_text="\n".join([p.text for p in paragraphs]),
+        full_text="\n".join(p.text for p in paragraphs),
         page_setup=page_setup
     )
+    started = time.perf_counter()
     result_apa = await analyze_content(doc_apa)
+    emit_ndjson("norms_apa", started, result_apa)
     print(f"Score APA: {result_apa.score}")
     print(f"Issues APA: {len(result_apa.issues)}")
     # Esperamos issues de Alinhamento, Espaçamento e Margem
@@ -96,14 +111,18 @@ async def run_test():
     doc_ieee = DocumentContent(
         paragraphs=paragraphs,
         format_type=FormatType.IEEE,
-        full_text="\n".join([p.text for p in paragraphs]),
+        full_text="\n".join(p.text for p in paragraphs),
         page_setup=page_setup
     )
+    started = time.perf_counter()
     result_ieee = await analyze_content(doc_ieee)
+    emit_ndjson("norms_ieee", started, result_ieee)
     print(f"Score IEEE: {result_ieee.score}")
     print(f"Issues IEEE: {len(result_ieee.issues)}")
-    for issue in result_ieee.issues:
-        print(f" - {issue.code}: {issue.message}")
+    if result_ieee.issues:
+        print("\n".join(f" - {issue.code}: {issue.message}" for issue in result_ieee.issues))
 
 if __name__ == "__main__":
+    # Saída em blocos (sem flush a cada linha); descarregada ao final
+    sys.stdout.reconfigure(line_buffering=False)
     asyncio.run(run_test())
@@ -18,6 +18,10 @@ WHITE = "#ffffff"
 # Tamanhos necessários para AppSource
 SIZES = [16, 32, 64, 80, 128]
 
+# Ícone desenhado uma única vez nesse tamanho e reduzido para os demais
+# (supersampling: bordas suavizadas mesmo em 16x16)
+MASTER_SIZE = 256
+
 def create_icon(size: int) -> Image.Image:
     """Cria um ícone quadrado com o logo Normaex - N dourado"""
 
@@ -76,11 +80,13 @@ def main():
     print(f"Diretório de saída: {OUTPUT_DIR}")
     print()
 
+    master = create_icon(MASTER_SIZE)
+
     for size in SIZES:
-        icon = create_icon(size)
+        icon = master.resize((size, size), Image.LANCZOS)
         filename = f"icon-{size}.png"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        icon.save(filepath, "PNG")
+        icon.save(filepath, "PNG", optimize=True)
         print(f"[OK] Criado: {filename}")
 
     print()